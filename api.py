@@ -31,6 +31,7 @@
 # the PacMan AI projects.
 
 from random import random
+from array import array
 from pacman import Directions
 import util
 
@@ -58,6 +59,10 @@ nonDeterministic = True
 # Probability that Pacman carries out the intended action:
 directionProb = 0.8
 
+# The order in which actions are numbered in transition tables (see
+# transitions() below).
+actions = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]
+
 # 
 # Sensing
 #
@@ -150,35 +155,50 @@ def food(state):
     # 2) Pacman is not moving, and the food is within the visibilityLimit.
     #
     # In both cases, walls block the view.
+    #
+    # The food grid lists its own food, in the same column by column
+    # order as a scan of every square, without reading each square.
     
-    foodList= []
-    foodGrid = state.getFood()
-    width = foodGrid.width
-    height = foodGrid.height
-    for i in range(width):
-        for j in range(height):
-            if foodGrid[i][j] == True:
-                foodList.append((i, j))
+    foodList = state.getFood().asList()
             
     # Return list of food that is visible
     return visible(foodList, state)
 
+def foodSet(state):
+    # Returns the same food positions as food(), but as a frozenset, so
+    # that testing whether there is food at a position takes constant
+    # time rather than a scan of the whole list.
+    #
+    # The last set is kept and handed back again for as long as the
+    # food, and where Pacman is and is facing, stay the same.
+
+    global lastFoodSet
+    pacmanState = state.getPacmanState()
+    key = (state.getFood(), pacmanState.getPosition(), pacmanState.getDirection(), partialVisibility)
+    if lastFoodSet == None or not sameKey(key, lastFoodSet[0]):
+        lastFoodSet = (key, frozenset(food(state)))
+    return lastFoodSet[1]
+
 def walls(state):
     # Returns a list of (x, y) pairs of wall positions
     #
     # This version just returns all the current wall locations
     # extracted from the state data.  In later versions, this will be
     # restricted by distance, and include some uncertainty.
-    
-    wallList= []
-    wallGrid = state.getWalls()
-    width = wallGrid.width
-    height = wallGrid.height
-    for i in range(width):
-        for j in range(height):
-            if wallGrid[i][j] == True:
-                wallList.append((i, j))            
-    return wallList
+    #
+    # The list is built once per layout (see layoutData()), and each
+    # call gets its own copy.
+
+    return list(layoutData(state).wallList)
+
+def wallSet(state):
+    # Returns the same wall positions as walls(), but as a frozenset, so
+    # that testing whether a position is a wall takes constant time.
+    #
+    # Walls never change during a game, so the set is built once per
+    # layout and shared.
+
+    return layoutData(state).wallSet
 
 def corners(state):
     # Returns the coordinates of the four corners of the state space.
@@ -195,9 +215,36 @@ def corners(state):
     corners.append((width-1, height-1))
     return corners
                 
+def transitions(state):
+    # Returns the transition table (see Transitions below) for the
+    # layout that state is played on.
+    #
+    # Tables only depend on the walls, so they are built once per
+    # layout and then shared.
+
+    data = layoutData(state)
+    if data.transitions == None:
+        data.transitions = Transitions(state.getWalls())
+    return data.transitions
+
 #
 # Acting
 #
+def moveOutcomes(direction):
+    # Returns the motion model for a move in the specified direction:
+    # a list of (direction, probability) pairs giving where Pacman
+    # can actually end up going.
+    #
+    # Pacman goes in the specified direction with probability
+    # directionProb, and otherwise goes to the left or the right of
+    # it, with equal probability. makeMove() samples from this, and
+    # the transition tables are built from it.
+
+    slip = 0.5 * (1 - directionProb)
+    return [(direction, directionProb),
+            (Directions.LEFT[direction], slip),
+            (Directions.RIGHT[direction], slip)]
+
 def makeMove(direction, legal):
     # This version implements non-deterministic movement.
     #
@@ -221,7 +268,7 @@ def makeMove(direction, legal):
         #
         # Otherwise make a different move.
         sample = random()
-        if sample <= directionProb:
+        if sample <= moveOutcomes(direction)[0][1]:
             # Here the non-deterministic action selection says to
             # return the original move, but we need to check it is
             # legal in case we were passed an illegal action (because,
@@ -257,63 +304,25 @@ def distanceLimited(objects, state, limit):
 
     return nearObjects
 
+def mazeDistance(a, b, state):
+    # The length of the shortest path from a to b that doesn't go
+    # through walls, unlike util.manhattanDistance. Positions can be
+    # halfway between squares, as scared ghosts are. The distances are
+    # worked out once per layout (see mazeDistances.py), so after the
+    # first call this is just a lookup.
+
+    return state.data.layout.getMazeDistances().getDistance(a, b)
+
 def inFront(object, facing, state):
     # Returns true if the object is along the corridor in the
     # direction of the parameter "facing" before a wall gets in the
     # way.
-    
-    pacman = state.getPacmanPosition()
-    pacman_x = pacman[0]
-    pacman_y = pacman[1]
-    wallList = walls(state)
+    #
+    # The corridor running in each direction from each square is
+    # worked out once per layout (see LayoutData.corridor()), so this
+    # is a single lookup.
 
-    # If Pacman is facing North
-    if facing == Directions.NORTH:
-        # Check if the object is anywhere due North of Pacman before a
-        # wall intervenes.
-        next = (pacman_x, pacman_y + 1)
-        while not next in wallList:
-            if next == object:
-                return True
-            else:
-                next = (pacman_x, next[1] + 1)
-        return False
-
-    # If Pacman is facing South
-    if facing == Directions.SOUTH:
-        # Check if the object is anywhere due North of Pacman before a
-        # wall intervenes.
-        next = (pacman_x, pacman_y - 1)
-        while not next in wallList:
-            if next == object:
-                return True
-            else:
-                next = (pacman_x, next[1] - 1)
-        return False
-
-    # If Pacman is facing East
-    if facing == Directions.EAST:
-        # Check if the object is anywhere due East of Pacman before a
-        # wall intervenes.
-        next = (pacman_x + 1, pacman_y)
-        while not next in wallList:
-            if next == object:
-                return True
-            else:
-                next = (next[0] + 1, pacman_y)
-        return False
-    
-    # If Pacman is facing West
-    if facing == Directions.WEST:
-        # Check if the object is anywhere due West of Pacman before a
-        # wall intervenes.
-        next = (pacman_x - 1, pacman_y)
-        while not next in wallList:
-            if next == object:
-                return True
-            else:
-                next = (next[0] - 1, pacman_y)
-        return False
+    return object in layoutData(state).corridor(state.getPacmanPosition(), facing)
 
 def atSide(object, facing, state):
     # Returns true if the object is in a side corridor perpendicular
@@ -353,24 +362,37 @@ def visible(objects, state):
 
     # This code creates partial observability by only returning some
     # of the members of objects.
+    #
+    # With full observability everything is visible, so there is no
+    # need to work out what is in view.
+    if not partialVisibility:
+        return objects
+
     facing = state.getPacmanState().configuration.direction
     visibleObjects = []
     sideObjects = []
+
+    # The corridors Pacman can see along, from the per-layout index
+    # that inFront() and atSide() use.
+    data = layoutData(state)
+    pacman = state.getPacmanPosition()
     
     if facing != Directions.STOP:
     
         # If Pacman is moving, visible objects are those in front of,
         # and to the side (if there are any side corridors).
+        front = data.corridor(pacman, facing)
+        side = data.corridor(pacman, Directions.LEFT[facing]) | data.corridor(pacman, Directions.RIGHT[facing])
 
         # Objects in front. Visible up to "visibilityLimit"
         for i in range(len(objects)):
-            if inFront(objects[i], facing, state):
+            if objects[i] in front:
                 visibleObjects.append(objects[i])
         visibleObjects = distanceLimited(visibleObjects, state, visibilityLimit)
         
         # Objects to the side. Visible up to "sideLimit"
         for i in range(len(objects)):
-            if atSide(objects[i], facing, state):
+            if objects[i] in side:
                 sideObjects.append(objects[i])
         sideObjects = distanceLimited(sideObjects, state, sideLimit)
 
@@ -385,15 +407,12 @@ def visible(objects, state):
         # after the first move is made, so this code will not run
         # after the first move :-(
 
+        corridors = [data.corridor(pacman, direction) for direction in
+                     [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]]
         for i in range(len(objects)):
-            if inFront(objects[i], Directions.NORTH, state):
-                visibleObjects.append(objects[i])
-            if inFront(objects[i], Directions.SOUTH, state):
-                visibleObjects.append(objects[i])
-            if inFront(objects[i], Directions.EAST, state):
-                visibleObjects.append(objects[i])
-            if inFront(objects[i], Directions.WEST, state):
-                visibleObjects.append(objects[i])
+            for corridor in corridors:
+                if objects[i] in corridor:
+                    visibleObjects.append(objects[i])
         visibleObjects = distanceLimited(visibleObjects, state, visibilityLimit)
 
     # If we return visibleObjects, we have partial observability. If
@@ -421,64 +440,177 @@ def selectNewMove(direction, legal):
     # direction. Need to pick another legal action.
 
     # Pick with 50% probability between the two perpendicular
-    # possibilities.
+    # possibilities, left and right of the chosen direction (so West
+    # and East when the chosen direction is North). If the move picked
+    # is legal, make it, otherwise don't move.
+    if direction not in Directions.LEFT or direction == Directions.STOP:
+        print "Why am I here?"
+        return None
+
     sample = random()
     if sample <= 0.5:
-        left = True
+        move = moveOutcomes(direction)[1][0]
     else:
-        left = False
-
-    # If chosen direction is North, then pick between West (left) and
-    # East. If these moves are legal, make them, otherwise don't move.
-    if direction == Directions.NORTH:
-        if left:
-            if Directions.WEST in legal:
-                return Directions.WEST
-            else:
-                return Directions.STOP
-        else:
-              if Directions.EAST in legal:
-                return Directions.EAST
-              else:
-                return Directions.STOP
+        move = moveOutcomes(direction)[2][0]
 
-    # If chosen direction is EAST
-    if direction == Directions.EAST:
-        if left:
-            if Directions.NORTH in legal:
-                return Directions.NORTH
-            else:
-                return Directions.STOP
-        else:
-              if Directions.SOUTH in legal:
-                return Directions.SOUTH
-              else:
-                return Directions.STOP
+    if move in legal:
+        return move
+    else:
+        return Directions.STOP
 
-    # If chosen direction is SOUTH
-    if direction == Directions.SOUTH:
-        if left:
-            if Directions.EAST in legal:
-                return Directions.EAST
-            else:
-                return Directions.STOP
-        else:
-              if Directions.WEST in legal:
-                return Directions.WEST
-              else:
-                return Directions.STOP
-  
-    # If chosen direction is WEST
-    if direction == Directions.WEST:
-        if left:
-            if Directions.SOUTH in legal:
-                return Directions.SOUTH
-            else:
-                return Directions.STOP
-        else:
-              if Directions.NORTH in legal:
-                return Directions.NORTH
-              else:
-                return Directions.STOP
+#
+# Caches
+#
+
+class LayoutData:
+    # Things about a layout that never change during a game, worked out
+    # the first time they are asked for.
+    def __init__(self, wallGrid):
+        self.width = wallGrid.width
+        self.height = wallGrid.height
+        self.wallList = tuple(wallGrid.asList())
+        self.wallSet = frozenset(self.wallList)
+        self.transitions = None
+        self.corridors = None
+
+    # Returns the squares along the corridor in direction facing from
+    # position, up to the first wall, as a frozenset. Facing Stop, or
+    # standing off the grid of squares, nothing is in front.
+    def corridor(self, position, facing):
+        if self.corridors == None:
+            self.corridors = self.makeCorridors()
+        return self.corridors.get((position, facing), frozenset())
+
+    # Walk the corridors from every square that isn't a wall.
+    def makeCorridors(self):
+        corridors = {}
+        directions = Transitions.vectors
+        for x in range(self.width):
+            for y in range(self.height):
+                if (x, y) in self.wallSet:
+                    continue
+                for facing in directions:
+                    dx, dy = directions[facing]
+                    squares = []
+                    next = (x + dx, y + dy)
+                    while not next in self.wallSet and 0 <= next[0] < self.width and 0 <= next[1] < self.height:
+                        squares.append(next)
+                        next = (next[0] + dx, next[1] + dy)
+                    corridors[((x, y), facing)] = frozenset(squares)
+        return corridors
+
+# LayoutData for the layouts seen so far, by wall grid.
+layouts = {}
+
+# The wall grid last looked up, and its LayoutData. Agents ask about
+# the same state many times in a row, and checking this first saves
+# hashing the grid each time.
+lastLayout = None
+
+# The key and frozenset from the last call of foodSet().
+lastFoodSet = None
+
+def layoutData(state):
+    # Returns the LayoutData for the layout that state is played on.
+
+    global lastLayout
+    wallGrid = state.getWalls()
+    if lastLayout == None or lastLayout[0] is not wallGrid:
+        if wallGrid not in layouts:
+            layouts[wallGrid] = LayoutData(wallGrid)
+        lastLayout = (wallGrid, layouts[wallGrid])
+    return lastLayout[1]
+
+def sameKey(a, b):
+    # Cache keys are tuples whose first element is a Grid, which counts
+    # as the same only if it is the very same object. The grid a state
+    # holds is replaced, never changed, when something changes.
+    return a[0] is b[0] and a[1:] == b[1:]
+
+#
+# Transition tables
+#
 
-    print "Why am I here?"
+class Transitions:
+    # A compiled version of the motion model for one layout, so that
+    # agents that plan with it (like the MDP agents) don't have to
+    # work out neighbours and walls over and over again.
+    #
+    # Every square that isn't a wall gets an index, and the table holds,
+    # in flat arrays:
+    #
+    # squares:       the (x, y) position of each index.
+    # neighbours:    for each square and each action (numbered as in
+    #                actions), the index of the square that the action
+    #                aims at, or -1 if it is a wall and the action isn't
+    #                legal. Square k, action a is at 4*k + a.
+    # successors:    for each square and each action, the squares that
+    #                the outcomes of moveOutcomes() land on, at
+    #                12*k + 3*a, 12*k + 3*a + 1 and 12*k + 3*a + 2. A
+    #                slip to the side that would walk into a wall is
+    #                counted as landing on the square the action aims
+    #                at. That is how the MDP agents have always scored
+    #                it, although makeMove() leaves Pacman where it is.
+    # probabilities: the probability of each of those outcomes.
+    #
+    # The index of a position is in the dictionary "index". Squares are
+    # numbered column by column, x first and then y.
+
+    vectors = {Directions.NORTH: (0, 1), Directions.SOUTH: (0, -1),
+               Directions.EAST: (1, 0), Directions.WEST: (-1, 0)}
+
+    def __init__(self, wallGrid):
+        self.width = wallGrid.width
+        self.height = wallGrid.height
+        self.squares = []
+        self.index = {}
+        for x in range(self.width):
+            for y in range(self.height):
+                if not wallGrid[x][y]:
+                    self.index[(x, y)] = len(self.squares)
+                    self.squares.append((x, y))
+
+        self.neighbours = array('i')
+        self.successors = array('i')
+        self.probabilities = array('d')
+        for k in range(len(self.squares)):
+            for action in actions:
+                target = self.step(k, action)
+                if target == k:
+                    self.neighbours.append(-1)
+                else:
+                    self.neighbours.append(target)
+                for (direction, probability) in moveOutcomes(action):
+                    successor = self.step(k, direction)
+                    if successor == k:
+                        successor = target
+                    self.successors.append(successor)
+                    self.probabilities.append(probability)
+
+    # The index of the square that moving in direction from square k
+    # leads to, which is k itself if there is a wall in the way.
+    def step(self, k, direction):
+        x, y = self.squares[k]
+        dx, dy = Transitions.vectors[direction]
+        return self.index.get((x + dx, y + dy), k)
+
+    # The number of squares in the table.
+    def size(self):
+        return len(self.squares)
+
+    # The expected utility of each legal action from square k, as a
+    # list of (action, value) pairs in the order of actions. utilities
+    # is a list with one value per square, or anything else that can be
+    # indexed by square, like a dictionary of the squares needed.
+    def expectedUtilities(self, utilities, k):
+        successors = self.successors
+        probabilities = self.probabilities
+        values = []
+        for a in range(4):
+            if self.neighbours[4*k + a] != -1:
+                s = 12*k + 3*a
+                values.append((actions[a],
+                               probabilities[s] * utilities[successors[s]]
+                               + probabilities[s + 1] * utilities[successors[s + 1]]
+                               + probabilities[s + 2] * utilities[successors[s + 2]]))
+        return values
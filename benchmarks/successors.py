@@ -0,0 +1,80 @@
+# successors.py
+# -------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+"""
+Measures how many successor states GameState.generateSuccessor produces per
+second, the inner loop of any agent that searches over game states.
+
+A fixed random game is played out; at each step every legal successor of
+the mover is generated, and then one of them is picked to continue from.
+
+Run from the top-level directory:  python benchmarks/successors.py -l mediumClassic
+"""
+
+import os
+import random
+import sys
+import time
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import layout
+from pacman import GameState
+
+def countSuccessors(lay, steps, seed):
+    """
+    Plays `steps` random moves on `lay`, expanding every state along the way.
+    Returns the number of successors generated.
+    """
+    rand = random.Random(seed)
+    start = GameState()
+    start.initialize(lay, lay.getNumGhosts())
+    state = start
+    agent = 0
+    generated = 0
+    for i in range(steps):
+        if state.isWin() or state.isLose():
+            state = start
+            agent = 0
+        successors = [state.generateSuccessor(agent, action) for action in state.getLegalActions(agent)]
+        generated += len(successors)
+        state = rand.choice(successors)
+        agent = (agent + 1) % state.getNumAgents()
+    return generated
+
+def main(argv):
+    parser = OptionParser(usage='python benchmarks/successors.py [options]')
+    parser.add_option('-l', '--layout', dest='layout', default='mediumClassic',
+                      help='the layout to play on [Default: %default]')
+    parser.add_option('-n', '--steps', dest='steps', type='int', default=20000,
+                      help='number of states to expand [Default: %default]')
+    parser.add_option('-r', '--repeat', dest='repeat', type='int', default=3,
+                      help='runs to take the best of [Default: %default]')
+    parser.add_option('-s', '--seed', dest='seed', type='int', default=0,
+                      help='random seed for the moves played [Default: %default]')
+    options, args = parser.parse_args(argv)
+
+    lay = layout.getLayout(options.layout)
+    if lay == None: raise Exception("The layout " + options.layout + " cannot be found")
+
+    best = None
+    for i in range(options.repeat):
+        begin = time.time()
+        generated = countSuccessors(lay, options.steps, options.seed)
+        elapsed = time.time() - begin
+        if best == None or elapsed < best: best = elapsed
+    print '%s: %d successors in %.3fs, %.0f successors/s' % (options.layout, generated, best, generated / best)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
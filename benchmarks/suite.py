@@ -0,0 +1,312 @@
+# suite.py
+# --------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+"""
+Benchmarks the engine and the agents on every layout in layouts/.
+
+For each layout, with fixed seeds, it measures:
+
+  parse_ms          building the Layout from its text, without the cache of
+                    compiled layouts
+  successors_per_s  GameState.generateSuccessor throughput (see successors.py)
+  walls_us          api.walls per call
+  food_us           api.food per call
+  visible_us        api.visible per call on the food, with partial visibility
+  sweep_ms          one sweep of MDPAgent's value iteration
+  game_s            a whole game of the agent with NullGraphics, up to a limit
+                    on moves and on time
+  game_ms_per_move  the same per move, which stays comparable when a game is
+                    called off
+
+The results are written as JSON.  Given a baseline written by an earlier
+run, each measurement is compared with it and any that got worse by more
+than the tolerance is reported, and the exit status is 1.
+
+Run from the top-level directory:
+
+  python benchmarks/suite.py -o results.json
+  python benchmarks/suite.py -o new.json --baseline results.json
+"""
+
+import inspect
+import json
+import os
+import platform
+import random
+import sys
+import time
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import api
+import layout
+import textDisplay
+import util
+from pacman import GameState, ClassicGameRules, loadAgent
+from successors import countSuccessors
+
+# Which way is better for each measurement; anything else is for information
+LOWER_IS_BETTER = ['parse_ms', 'walls_us', 'food_us', 'visible_us', 'sweep_ms', 'game_s', 'game_ms_per_move']
+HIGHER_IS_BETTER = ['successors_per_s']
+
+SEED = 0
+
+# Quick measurements are repeated until they take at least this long, in
+# seconds, so that they aren't lost in the noise
+MIN_TIME = 0.05
+
+def bestTime(function, repeat, minTime=0):
+    """
+    The shortest time, in seconds, a call of function took, out of repeat
+    tries.  Each try calls function as many times as it takes to fill
+    minTime, and counts the average.
+    """
+    best = None
+    for i in range(repeat):
+        calls = 0
+        begin = time.time()
+        while True:
+            function()
+            calls += 1
+            elapsed = time.time() - begin
+            if elapsed >= minTime: break
+        if best == None or elapsed / calls < best: best = elapsed / calls
+    return best
+
+def sampleStates(lay, count):
+    """
+    States from a fixed random walk on lay, Pacman's turns only, to time
+    the api functions on.
+    """
+    rand = random.Random(SEED)
+    start = GameState()
+    start.initialize(lay, lay.getNumGhosts())
+    states = []
+    state = start
+    while len(states) < count:
+        if state.isWin() or state.isLose():
+            state = start
+        states.append(state)
+        for agent in range(state.getNumAgents()):
+            if state.isWin() or state.isLose(): break
+            state = state.generateSuccessor(agent, rand.choice(state.getLegalActions(agent)))
+    return states
+
+def timeApi(states, function, repeat):
+    """
+    Mean time per call of function(state) over states, in microseconds.
+    """
+    def callAll():
+        for state in states:
+            function(state)
+    return 1e6 * bestTime(callAll, repeat, MIN_TIME) / len(states)
+
+def timeVisible(states, repeat):
+    """
+    Mean time per call of api.visible on the food of each of states, in
+    microseconds, with partial visibility.  api.food would check the
+    visibility itself, so the food is listed before the timing starts.
+    """
+    calls = [(api.food(state), state) for state in states]
+    def callAll():
+        for food, state in calls:
+            api.visible(food, state)
+    api.partialVisibility = True
+    try:
+        return 1e6 * bestTime(callAll, repeat, MIN_TIME) / len(calls)
+    finally:
+        api.partialVisibility = False
+
+class BenchmarkRules(ClassicGameRules):
+    """
+    The classic rules, but the game is called off after maxMoves moves or
+    maxTime seconds, so that a slow agent, or one that never finishes,
+    can't hold up the suite.
+    """
+    def __init__(self, maxMoves, maxTime, timeout=30):
+        ClassicGameRules.__init__(self, timeout)
+        self.maxMoves = maxMoves
+        self.deadline = time.time() + maxTime
+
+    def process(self, state, game):
+        ClassicGameRules.process(self, state, game)
+        if len(game.moveHistory) >= self.maxMoves or time.time() >= self.deadline:
+            game.gameOver = True
+
+def sweepFunction(agent, state, sweeps):
+    """
+    A function that runs sweeps sweeps of the agent's value iteration on
+    state.  MDPAgent.updateUtilities also takes the state, and
+    MapAgent.updateUtilities doesn't.
+    """
+    if not hasattr(agent, 'updateUtilities'): raise Exception('%s does no value iteration' % agent.__class__.__name__)
+    args = [api.wallSet(state), api.foodSet(state), api.ghosts(state), sweeps]
+    if 'state' in inspect.getargspec(agent.updateUtilities).args:
+        args.append(state)
+    return lambda: agent.updateUtilities(*args)
+
+def makeAgent(agentType):
+    util.mutePrint()
+    try: return agentType()
+    finally: util.unmutePrint()
+
+def benchmarkLayout(name, options, agentType, ghostType):
+    """
+    Runs every benchmark on the named layout.  Returns a dictionary of the
+    measurements; a benchmark that fails gets its error under its name.
+    """
+    results = {}
+    path = os.path.join('layouts', name + '.lay')
+    f = open(path)
+    try: text = [line.strip() for line in f]
+    finally: f.close()
+    lay = layout.Layout(text, path)
+
+    def measure(key, function):
+        random.seed(SEED)
+        try:
+            results[key] = function()
+        except Exception, e:
+            results[key + '_error'] = '%s: %s' % (e.__class__.__name__, e)
+
+    def parse():
+        layout.COMPILED_LAYOUT_CACHE.clear()
+        return layout.Layout(text, path)
+    measure('parse_ms', lambda: 1000 * bestTime(parse, options.repeat, MIN_TIME))
+
+    def successorRate():
+        best = None
+        for i in range(options.repeat):
+            begin = time.time()
+            generated = countSuccessors(lay, options.steps, SEED)
+            rate = generated / max(1e-9, time.time() - begin)
+            if best == None or rate > best: best = rate
+        return best
+    measure('successors_per_s', successorRate)
+
+    states = sampleStates(lay, options.samples)
+    measure('walls_us', lambda: timeApi(states, api.walls, options.repeat))
+    measure('food_us', lambda: timeApi(states, api.food, options.repeat))
+    measure('visible_us', lambda: timeVisible(states, options.repeat))
+
+    def sweep():
+        agent = makeAgent(agentType)
+        state = states[0]
+        util.mutePrint()
+        try:
+            agent.registerInitialState(state)
+            run = sweepFunction(agent, state, options.sweeps)
+            return 1000 * bestTime(run, options.repeat) / options.sweeps
+        finally:
+            util.unmutePrint()
+    measure('sweep_ms', sweep)
+
+    def game():
+        ghosts = [ghostType(i + 1) for i in range(lay.getNumGhosts())]
+        agent = makeAgent(agentType)
+        rules = BenchmarkRules(options.maxMoves, options.maxGameTime)
+        begin = time.time()
+        util.mutePrint()
+        try:
+            played = rules.newGame(lay, agent, ghosts, textDisplay.NullGraphics(), True)
+            played.run()
+        finally:
+            util.unmutePrint()
+        elapsed = time.time() - begin
+        results['game_moves'] = len(played.moveHistory)
+        results['game_score'] = played.state.getScore()
+        results['game_ms_per_move'] = 1000 * elapsed / max(1, len(played.moveHistory))
+        return elapsed
+    measure('game_s', game)
+    return results
+
+def compare(results, baseline, tolerance):
+    """
+    Returns (layout, measurement, baseline value, new value) for each
+    measurement that is worse than the baseline by more than tolerance, a
+    fraction.
+    """
+    regressions = []
+    for name in sorted(results):
+        if name not in baseline: continue
+        for key, value in sorted(results[name].items()):
+            old = baseline[name].get(key)
+            if old == None or not isinstance(value, (int, float)): continue
+            if key in LOWER_IS_BETTER and value > old * (1 + tolerance):
+                regressions.append((name, key, old, value))
+            elif key in HIGHER_IS_BETTER and value * (1 + tolerance) < old:
+                regressions.append((name, key, old, value))
+    return regressions
+
+def main(argv):
+    parser = OptionParser(usage='python benchmarks/suite.py [options]')
+    parser.add_option('-o', '--output', dest='output', default='benchmark.json',
+                      help='file to write the results to [Default: %default]')
+    parser.add_option('-b', '--baseline', dest='baseline', default=None,
+                      help='results of an earlier run to compare against')
+    parser.add_option('-t', '--tolerance', dest='tolerance', type='float', default=0.5,
+                      help='how much worse than the baseline, as a fraction, counts as a regression [Default: %default]')
+    parser.add_option('-l', '--layouts', dest='layouts', default=None,
+                      help='comma separated layouts to run, instead of all of them')
+    parser.add_option('-p', '--pacman', dest='agent', default='MDPAgent',
+                      help='the agent to time sweeps and games of [Default: %default]')
+    parser.add_option('-g', '--ghosts', dest='ghost', default='RandomGhost',
+                      help='the ghost agent for the games [Default: %default]')
+    parser.add_option('-r', '--repeat', dest='repeat', type='int', default=3,
+                      help='runs to take the best of [Default: %default]')
+    parser.add_option('--steps', dest='steps', type='int', default=2000,
+                      help='states to expand when counting successors [Default: %default]')
+    parser.add_option('--samples', dest='samples', type='int', default=200,
+                      help='states to time the api functions on [Default: %default]')
+    parser.add_option('--sweeps', dest='sweeps', type='int', default=20,
+                      help='value iteration sweeps to time [Default: %default]')
+    parser.add_option('--maxMoves', dest='maxMoves', type='int', default=500,
+                      help='moves (of all agents) after which a game is called off [Default: %default]')
+    parser.add_option('--maxGameTime', dest='maxGameTime', type='float', default=20,
+                      help='seconds after which a game is called off [Default: %default]')
+    options, args = parser.parse_args(argv)
+
+    if options.layouts != None:
+        names = options.layouts.split(',')
+    else:
+        names = sorted([f[:-4] for f in os.listdir('layouts') if f.endswith('.lay')])
+    agentType = loadAgent(options.agent, True)
+    ghostType = loadAgent(options.ghost, True)
+
+    results = {}
+    for name in names:
+        begin = time.time()
+        results[name] = benchmarkLayout(name, options, agentType, ghostType)
+        errors = [key for key in results[name] if key.endswith('_error')]
+        print '%-24s %6.1fs%s' % (name, time.time() - begin, ['', '  (failed: %s)' % ', '.join(errors)][len(errors) > 0])
+
+    report = {'python': platform.python_version(), 'machine': platform.machine(), 'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+              'agent': options.agent, 'ghosts': options.ghost, 'results': results}
+    f = open(options.output, 'w')
+    try: json.dump(report, f, indent=1, sort_keys=True)
+    finally: f.close()
+    print 'Results written to %s' % options.output
+
+    if options.baseline != None:
+        f = open(options.baseline)
+        try: baseline = json.load(f)
+        finally: f.close()
+        regressions = compare(results, baseline['results'], options.tolerance)
+        for name, key, old, new in regressions:
+            print 'REGRESSION %-24s %-18s %12.3f -> %12.3f' % (name, key, old, new)
+        if regressions: sys.exit(1)
+        print 'No regressions against %s' % options.baseline
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
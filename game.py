@@ -35,6 +35,7 @@ class Agent:
     following methods which will be called if they exist:
 
     def registerInitialState(self, state): # inspects the starting state
+    def setMoveWarningTime(self, seconds): # called first, with the time a move can take before a warning
     """
     def __init__(self, index=0):
         self.index = index
@@ -183,6 +184,15 @@ class Grid:
     def __setitem__(self, key, item):
         self.data[key] = item
 
+    def get(self, x, y):
+        """
+        The same as grid[x][y].  BitGrid has it too, where it is faster.
+        """
+        return self.data[x][y]
+
+    def set(self, x, y, value):
+        self.data[x][y] = value
+
     def __str__(self):
         out = [[str(self.data[x][y])[0] for x in range(self.width)] for y in range(self.height)]
         out.reverse()
@@ -274,11 +284,165 @@ class Grid:
                 bools.append(False)
         return bools
 
+class BitGrid:
+    """
+    A 2-dimensional array of booleans backed by a single int, with the same
+    interface as Grid.  Cell (x,y) is bit x * height + y, the order Grid uses
+    for packBits and __hash__, so a BitGrid hashes like the equivalent Grid.
+
+    Since ints are immutable, copying, comparing, hashing and counting cost
+    in proportion to the number of machine words rather than the number of
+    cells.  That makes it a good fit for the food grid, which is copied every
+    time Pacman eats and hashed with every state.  A copy never shares
+    changes with the original, so shallowCopy is the same as copy.
+    """
+    def __init__(self, width, height, initialValue=False, bitRepresentation=None):
+        if initialValue not in [False, True]: raise Exception('Grids can only contain booleans')
+        self.CELLS_PER_INT = 30
+
+        self.width = width
+        self.height = height
+        self.bits = 0
+        if initialValue:
+            self.bits = (1 << (width * height)) - 1
+        if bitRepresentation:
+            self._unpackBits(bitRepresentation)
+
+    def __getitem__(self, i):
+        if i < 0: i += self.width
+        if not 0 <= i < self.width: raise IndexError('grid index out of range')
+        return _BitColumn(self, i)
+
+    def get(self, x, y):
+        """
+        The same as grid[x][y], without making a column to index into.
+        Cheaper for a single read, so the game rules use it for food.
+        """
+        if not (0 <= x < self.width and 0 <= y < self.height): raise IndexError('grid index out of range')
+        return bool(self.bits >> (x * self.height + y) & 1)
+
+    def set(self, x, y, value):
+        """
+        The same as grid[x][y] = value, without making a column.
+        """
+        if not (0 <= x < self.width and 0 <= y < self.height): raise IndexError('grid index out of range')
+        if value:
+            self.bits |= 1 << (x * self.height + y)
+        else:
+            self.bits &= ~(1 << (x * self.height + y))
+
+    def __str__(self):
+        out = [[str(self.get(x, y))[0] for x in range(self.width)] for y in range(self.height)]
+        out.reverse()
+        return '\n'.join([''.join(x) for x in out])
+
+    def __eq__(self, other):
+        if other == None: return False
+        if isinstance(other, BitGrid):
+            return self.bits == other.bits and self.width == other.width and self.height == other.height
+        return self.data == other.data
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.bits)
+
+    def _getData(self):
+        return [[bool(self.bits >> (x * self.height + y) & 1) for y in range(self.height)] for x in range(self.width)]
+
+    # The cells as a list of lists, so that a Grid compares equal to the
+    # equivalent BitGrid.
+    data = property(_getData)
+
+    def copy(self):
+        g = BitGrid(self.width, self.height)
+        g.bits = self.bits
+        return g
+
+    def deepCopy(self):
+        return self.copy()
+
+    def shallowCopy(self):
+        return self.copy()
+
+    def count(self, item =True ):
+        ones = bin(self.bits).count('1')
+        if item == True: return ones
+        if item == False: return self.width * self.height - ones
+        return 0
+
+    def asList(self, key = True):
+        if key != True:
+            return [(x, y) for x in range(self.width) for y in range(self.height) if self.get(x, y) == key]
+        list = []
+        bits = self.bits
+        while bits:
+            low = bits & -bits
+            list.append(self._cellIndexToPosition(low.bit_length() - 1))
+            bits ^= low
+        return list
+
+    def packBits(self):
+        """
+        Returns an efficient int list representation, the same one
+        Grid.packBits gives
+
+        (width, height, bitPackedInts...)
+        """
+        cells = self.width * self.height
+        # Cell i is character i, so each run of CELLS_PER_INT characters
+        # reads as the packed int with its first cell in the top bit.
+        order = bin(self.bits)[2:].zfill(cells)[::-1] if self.bits else '0' * cells
+        bits = [self.width, self.height]
+        for start in range(0, cells + 1, self.CELLS_PER_INT):
+            chunk = order[start:start + self.CELLS_PER_INT]
+            bits.append(int(chunk.ljust(self.CELLS_PER_INT, '0'), 2))
+        return tuple(bits)
+
+    def _cellIndexToPosition(self, index):
+        x = index / self.height
+        y = index % self.height
+        return x, y
+
+    def _unpackBits(self, bits):
+        """
+        Fills in data from a bit-level representation
+        """
+        cells = self.width * self.height
+        order = ''.join([bin(packed)[2:].zfill(self.CELLS_PER_INT) for packed in bits])[:cells]
+        self.bits = int(order[::-1], 2) if order else 0
+
+class _BitColumn:
+    """
+    Column x of a BitGrid, so that grid[x][y] reads and writes work as they
+    do on a Grid.
+    """
+    def __init__(self, grid, x):
+        self.grid = grid
+        self.base = x * grid.height
+
+    def __getitem__(self, y):
+        if y < 0: y += self.grid.height
+        if not 0 <= y < self.grid.height: raise IndexError('grid index out of range')
+        return bool(self.grid.bits >> (self.base + y) & 1)
+
+    def __setitem__(self, y, value):
+        if y < 0: y += self.grid.height
+        if not 0 <= y < self.grid.height: raise IndexError('grid index out of range')
+        if value:
+            self.grid.bits |= 1 << (self.base + y)
+        else:
+            self.grid.bits &= ~(1 << (self.base + y))
+
+    def __len__(self):
+        return self.grid.height
+
 def reconstituteGrid(bitRep):
     if type(bitRep) is not type((1,2)):
         return bitRep
     width, height = bitRep[:2]
-    return Grid(width, height, bitRepresentation= bitRep[2:])
+    return BitGrid(width, height, bitRepresentation= bitRep[2:])
 
 ####################################
 # Parts you shouldn't have to read #
@@ -375,14 +539,21 @@ class GameStateData:
     def __init__( self, prevState = None ):
         """
         Generates a new data packet by copying information from its predecessor.
+
+        The copy is copy-on-write: the food grid, the capsule list and the
+        agent states are shared with the predecessor until something changes
+        them.  Code that changes the state must replace the food grid or the
+        capsule list rather than edit it, and must go through
+        getAgentStateForUpdate to change an agent state.
         """
         if prevState != None:
-            self.food = prevState.food.shallowCopy()
-            self.capsules = prevState.capsules[:]
-            self.agentStates = self.copyAgentStates( prevState.agentStates )
+            self.food = prevState.food
+            self.capsules = prevState.capsules
+            self.agentStates = prevState.agentStates[:]
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
+        self._ownedAgentStates = set()
 
         self._foodEaten = None
         self._foodAdded = None
@@ -393,9 +564,17 @@ class GameStateData:
         self.scoreChange = 0
 
     def deepCopy( self ):
+        """
+        Copies everything an agent could change.  The layout never changes
+        during a game, so it is shared rather than copied: Game.run hands
+        every agent a deep copy every turn, and rebuilding the layout from
+        its text each time was most of the cost.
+        """
         state = GameStateData( self )
         state.food = self.food.deepCopy()
-        state.layout = self.layout.deepCopy()
+        state.capsules = self.capsules[:]
+        state.agentStates = self.copyAgentStates( self.agentStates )
+        state._ownedAgentStates = set(range(len(state.agentStates)))
         state._agentMoved = self._agentMoved
         state._foodEaten = self._foodEaten
         state._foodAdded = self._foodAdded
@@ -408,6 +587,17 @@ class GameStateData:
             copiedStates.append( agentState.copy() )
         return copiedStates
 
+    def getAgentStateForUpdate( self, agentIndex ):
+        """
+        Returns the state of the given agent, ready to be changed.  The first
+        time this is called for an agent, its state is copied so that the
+        change doesn't show in the predecessor it is shared with.
+        """
+        if agentIndex not in self._ownedAgentStates:
+            self.agentStates[agentIndex] = self.agentStates[agentIndex].copy()
+            self._ownedAgentStates.add( agentIndex )
+        return self.agentStates[agentIndex]
+
     def __eq__( self, other ):
         """
         Allows two states to be compared.
@@ -440,7 +630,7 @@ class GameStateData:
         for x in range(width):
             for y in range(height):
                 food, walls = self.food, self.layout.walls
-                map[x][y] = self._foodWallStr(food[x][y], walls[x][y])
+                map[x][y] = self._foodWallStr(food.get(x, y), walls[x][y])
 
         for agentState in self.agentStates:
             if agentState == None: continue
@@ -496,6 +686,7 @@ class GameStateData:
         self.scoreChange = 0
 
         self.agentStates = []
+        self._ownedAgentStates = set()
         numGhosts = 0
         for isPacman, pos in layout.agentPositions:
             if not isPacman:
@@ -510,6 +701,55 @@ try:
 except:
     _BOINC_ENABLED = False
 
+class GameTimings:
+    """
+    Latency histograms (see util.LatencyHistogram) for each agent and each
+    phase of a turn in Game.run:
+
+      startup      registerInitialState
+      observation  making the agent's copy of the state, and observationFunction
+      action       getAction
+      successor    generateSuccessor for the agent's move
+      display      updating the display after the move
+      rules        rules.process after the move
+
+    The last three are the engine's overhead rather than the agent's.
+    Timings from several games can be merged and reported together.
+    """
+    PHASES = ['startup', 'observation', 'action', 'successor', 'display', 'rules']
+
+    def __init__( self ):
+        self.histograms = {}
+        self.agentNames = {}
+
+    def add( self, agentIndex, phase, seconds ):
+        key = (agentIndex, phase)
+        if key not in self.histograms: self.histograms[key] = LatencyHistogram()
+        self.histograms[key].add( seconds )
+
+    def merge( self, other ):
+        self.agentNames.update( other.agentNames )
+        for key, histogram in other.histograms.items():
+            if key not in self.histograms: self.histograms[key] = LatencyHistogram()
+            self.histograms[key].merge( histogram )
+
+    def report( self ):
+        """
+        A table of the count, mean, p50, p99, max and total of each agent's
+        phases, with times in milliseconds.
+        """
+        lines = ['%-24s %-12s %8s %9s %9s %9s %9s %10s' % ('Agent', 'Phase', 'Count', 'Mean', 'p50', 'p99', 'Max', 'Total')]
+        agents = sorted( set( [agentIndex for agentIndex, phase in self.histograms] ) )
+        for agentIndex in agents:
+            name = '%d %s' % (agentIndex, self.agentNames.get( agentIndex, '' ))
+            for phase in self.PHASES:
+                histogram = self.histograms.get( (agentIndex, phase) )
+                if histogram == None: continue
+                lines.append( '%-24s %-12s %8d %9.3f %9.3f %9.3f %9.3f %10.1f' %
+                              (name, phase, histogram.count, 1000 * histogram.mean(), 1000 * histogram.percentile( 50 ),
+                               1000 * histogram.percentile( 99 ), 1000 * histogram.max, 1000 * histogram.total) )
+        return '\n'.join( lines )
+
 class Game:
     """
     The Game manages the control flow, soliciting actions from agents.
@@ -530,6 +770,9 @@ class Game:
         self.agentTimeout = False
         import cStringIO
         self.agentOutput = [cStringIO.StringIO() for agent in agents]
+        self.timings = GameTimings()
+        for i, agent in enumerate( agents ):
+            self.timings.agentNames[i] = agent.__class__.__name__
 
     def getProgress(self):
         if self.gameOver:
@@ -583,8 +826,11 @@ class Game:
                 self.unmute()
                 self._agentCrash(i, quiet=True)
                 return
+            if ("setMoveWarningTime" in dir(agent)):
+                agent.setMoveWarningTime(self.rules.getMoveWarningTime(i))
             if ("registerInitialState" in dir(agent)):
                 self.mute(i)
+                phase_start = time.time()
                 if self.catchExceptions:
                     try:
                         timed_func = TimeoutFunction(agent.registerInitialState, int(self.rules.getMaxStartupTime(i)))
@@ -606,10 +852,12 @@ class Game:
                 else:
                     agent.registerInitialState(self.state.deepCopy())
                 ## TODO: could this exceed the total time
+                self.timings.add(i, 'startup', time.time() - phase_start)
                 self.unmute()
 
         agentIndex = self.startingIndex
         numAgents = len( self.agents )
+        observers = ['observationFunction' in dir( agent ) for agent in self.agents]
 
         while not self.gameOver:
             # Fetch the next agent
@@ -617,7 +865,8 @@ class Game:
             move_time = 0
             skip_action = False
             # Generate an observation of the state
-            if 'observationFunction' in dir( agent ):
+            phase_start = time.time()
+            if observers[agentIndex]:
                 self.mute(agentIndex)
                 if self.catchExceptions:
                     try:
@@ -638,9 +887,11 @@ class Game:
                 self.unmute()
             else:
                 observation = self.state.deepCopy()
+            self.timings.add(agentIndex, 'observation', time.time() - phase_start)
 
             # Solicit an action
             action = None
+            phase_start = time.time()
             self.mute(agentIndex)
             if self.catchExceptions:
                 try:
@@ -683,10 +934,14 @@ class Game:
                     self.unmute()
                     return
             else:
+                start_time = time.time()
                 action = agent.getAction(observation)
+                self.totalAgentTimes[agentIndex] += time.time() - start_time
             self.unmute()
+            self.timings.add(agentIndex, 'action', time.time() - phase_start)
 
             # Execute the action
+            phase_start = time.time()
             self.moveHistory.append( (agentIndex, action) )
             if self.catchExceptions:
                 try:
@@ -698,14 +953,19 @@ class Game:
                     return
             else:
                 self.state = self.state.generateSuccessor( agentIndex, action )
+            self.timings.add(agentIndex, 'successor', time.time() - phase_start)
 
             # Change the display
+            phase_start = time.time()
             self.display.update( self.state.data )
             ###idx = agentIndex - agentIndex % 2 + 1
             ###self.display.update( self.state.makeObservation(idx).data )
+            self.timings.add(agentIndex, 'display', time.time() - phase_start)
 
             # Allow for game specific conditions (winning, losing, etc.)
+            phase_start = time.time()
             self.rules.process(self.state, self)
+            self.timings.add(agentIndex, 'rules', time.time() - phase_start)
             # Track progress
             if agentIndex == numAgents + 1: self.numMoves += 1
             # Next agent
@@ -13,53 +13,194 @@
 
 
 from util import manhattanDistance
-from game import Grid
+from game import Grid, BitGrid
 import os
 import random
+import hashlib
+import cPickle
+import copy
 
 VISIBILITY_MATRIX_CACHE = {}
+MAZE_DISTANCES_CACHE = {}
+COMPILED_LAYOUT_CACHE = {}
+
+# If True, indexes worked out for a layout (like its visibility matrix)
+# are also saved next to the layout file, and loaded from there rather
+# than rebuilt the next time.
+PERSIST_CACHES = False
 
 class Layout:
     """
     A Layout manages the static information about the game board.
     """
 
-    def __init__(self, layoutText):
+    def __init__(self, layoutText, filename=None):
         self.width = len(layoutText[0])
         self.height= len(layoutText)
-        self.walls = Grid(self.width, self.height, False)
-        self.food = Grid(self.width, self.height, False)
-        self.capsules = []
-        self.agentPositions = []
-        self.numGhosts = 0
-        self.processLayoutText(layoutText)
         self.layoutText = layoutText
-        self.totalFood = len(self.food.asList())
-        # self.initializeVisibilityMatrix()
+        self.filename = filename
+        self.visibility = None
+        self.mazeDistances = None
+        self.layoutHash = None
+        self.compile()
+
+    def compile(self):
+        """
+        Sets up the walls, food, capsules and agent positions from the
+        layout text.  Parsed layouts are cached by layout hash, so a
+        layout is only parsed once per process, and with PERSIST_CACHES
+        it is saved in binary form next to the layout file and loaded from
+        there in later runs.  The parts are shared between the layouts
+        made from the same text, and must not be changed.
+        """
+        key = self.getHash()
+        if key not in COMPILED_LAYOUT_CACHE:
+            compiled = self._loadCache('compiled')
+            if compiled == None:
+                self.walls = Grid(self.width, self.height, False)
+                self.food = BitGrid(self.width, self.height, False)
+                self.capsules = []
+                self.agentPositions = []
+                self.numGhosts = 0
+                self.processLayoutText(self.layoutText)
+                self.totalFood = self.food.count()
+                if self._cacheFile('compiled') != None:
+                    self._saveCache('compiled', self._packCompiled())
+            else:
+                self._unpackCompiled(compiled)
+            COMPILED_LAYOUT_CACHE[key] = (self.walls, self.food, self.capsules, self.agentPositions,
+                                          self.numGhosts, self.totalFood)
+        self.walls, self.food, self.capsules, self.agentPositions, self.numGhosts, self.totalFood = COMPILED_LAYOUT_CACHE[key]
+
+    def _packCompiled(self):
+        """
+        The parsed layout as a tuple of plain values: the walls and food
+        as integers with one bit per square (see BitGrid), then the
+        capsules, agent positions and number of ghosts.
+        """
+        walls = 0
+        for x in range(self.width):
+            for y in range(self.height):
+                if self.walls[x][y]: walls |= 1 << (x * self.height + y)
+        return (walls, self.food.bits, tuple(self.capsules),
+                tuple(self.agentPositions), self.numGhosts)
+
+    def _unpackCompiled(self, compiled):
+        walls, food, capsules, agentPositions, numGhosts = compiled
+        cells = bin(walls)[2:].zfill(self.width * self.height)[::-1]
+        self.walls = Grid(self.width, self.height, False)
+        self.walls.data = [[c == '1' for c in cells[x * self.height:(x + 1) * self.height]] for x in range(self.width)]
+        self.food = BitGrid(self.width, self.height, False)
+        self.food.bits = food
+        self.capsules = list(capsules)
+        self.agentPositions = list(agentPositions)
+        self.numGhosts = numGhosts
+        self.totalFood = self.food.count()
 
     def getNumGhosts(self):
         return self.numGhosts
 
+    def getHash(self):
+        """
+        Returns a hash of the layout text, which identifies the layout
+        across copies and processes.
+        """
+        if self.layoutHash == None:
+            self.layoutHash = hashlib.sha1('\n'.join(self.layoutText)).hexdigest()
+        return self.layoutHash
+
     def initializeVisibilityMatrix(self):
+        """
+        Works out what Pacman can see from every square, facing each way.
+
+        Matrices are cached by layout hash, and if PERSIST_CACHES is set
+        they are also saved next to the layout file for later runs.
+        """
         global VISIBILITY_MATRIX_CACHE
-        if reduce(str.__add__, self.layoutText) not in VISIBILITY_MATRIX_CACHE:
-            from game import Directions
-            vecs = [(-0.5,0), (0.5,0),(0,-0.5),(0,0.5)]
-            dirs = [Directions.NORTH, Directions.SOUTH, Directions.WEST, Directions.EAST]
-            vis = Grid(self.width, self.height, {Directions.NORTH:set(), Directions.SOUTH:set(), Directions.EAST:set(), Directions.WEST:set(), Directions.STOP:set()})
-            for x in range(self.width):
-                for y in range(self.height):
-                    if self.walls[x][y] == False:
-                        for vec, direction in zip(vecs, dirs):
-                            dx, dy = vec
-                            nextx, nexty = x + dx, y + dy
-                            while (nextx + nexty) != int(nextx) + int(nexty) or not self.walls[int(nextx)][int(nexty)] :
-                                vis[x][y][direction].add((nextx, nexty))
-                                nextx, nexty = x + dx, y + dy
-            self.visibility = vis
-            VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)] = vis
-        else:
-            self.visibility = VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)]
+        key = self.getHash()
+        if key not in VISIBILITY_MATRIX_CACHE:
+            vis = self._loadCache('vis')
+            if vis == None:
+                vis = self._buildVisibilityMatrix()
+                self._saveCache('vis', vis)
+            VISIBILITY_MATRIX_CACHE[key] = vis
+        self.visibility = VISIBILITY_MATRIX_CACHE[key]
+
+    def getMazeDistances(self):
+        """
+        Returns the MazeDistances between all pairs of open squares, built
+        the first time they are asked for.  Like visibility matrices they
+        are cached by layout hash, and saved with the layout if
+        PERSIST_CACHES is set.
+        """
+        if self.mazeDistances == None:
+            from mazeDistances import MazeDistances
+            key = self.getHash()
+            if key not in MAZE_DISTANCES_CACHE:
+                distances = self._loadCache('dist')
+                if distances == None:
+                    distances = MazeDistances(self.walls)
+                    self._saveCache('dist', distances)
+                MAZE_DISTANCES_CACHE[key] = distances
+            self.mazeDistances = MAZE_DISTANCES_CACHE[key]
+        return self.mazeDistances
+
+    def _buildVisibilityMatrix(self):
+        """
+        Maps each (x, y) that is not a wall to a dictionary from direction
+        to the frozenset of positions visible that way: everything along
+        the corridor up to the first wall, in half steps because scared
+        ghosts move at half speed. Nothing is visible facing Stop.
+        """
+        from game import Directions
+        vecs = [(0,0.5), (0,-0.5), (-0.5,0), (0.5,0)]
+        dirs = [Directions.NORTH, Directions.SOUTH, Directions.WEST, Directions.EAST]
+        vis = {}
+        for x in range(self.width):
+            for y in range(self.height):
+                if self.walls[x][y] == False:
+                    visible = {Directions.STOP: frozenset()}
+                    for vec, direction in zip(vecs, dirs):
+                        dx, dy = vec
+                        seen = []
+                        nextx, nexty = x + dx, y + dy
+                        while 0 <= nextx < self.width and 0 <= nexty < self.height and \
+                              ((nextx + nexty) != int(nextx) + int(nexty) or not self.walls[int(nextx)][int(nexty)]):
+                            seen.append((nextx, nexty))
+                            nextx, nexty = nextx + dx, nexty + dy
+                        visible[direction] = frozenset(seen)
+                    vis[(x, y)] = visible
+        return vis
+
+    def _cacheFile(self, suffix):
+        if not PERSIST_CACHES or self.filename == None: return None
+        return self.filename + '.' + suffix
+
+    def _loadCache(self, suffix):
+        """
+        Returns what was saved with _saveCache, or None if there is nothing
+        saved for this version of the layout.
+        """
+        fname = self._cacheFile(suffix)
+        if fname == None or not os.path.exists(fname): return None
+        try:
+            f = open(fname, 'rb')
+            try: saved = cPickle.load(f)
+            finally: f.close()
+        except Exception:
+            return None
+        if saved.get('hash') != self.getHash(): return None
+        return saved['data']
+
+    def _saveCache(self, suffix, data):
+        fname = self._cacheFile(suffix)
+        if fname == None: return
+        try:
+            f = open(fname, 'wb')
+            try: cPickle.dump({'hash': self.getHash(), 'data': data}, f, cPickle.HIGHEST_PROTOCOL)
+            finally: f.close()
+        except (IOError, OSError):
+            pass
 
     def isWall(self, pos):
         x, col = pos
@@ -83,14 +224,21 @@ class Layout:
         return pos
 
     def isVisibleFrom(self, ghostPos, pacPos, pacDirection):
+        if self.visibility == None: self.initializeVisibilityMatrix()
         row, col = [int(x) for x in pacPos]
-        return ghostPos in self.visibility[row][col][pacDirection]
+        return ghostPos in self.visibility[(row, col)][pacDirection]
 
     def __str__(self):
         return "\n".join(self.layoutText)
 
     def deepCopy(self):
-        return Layout(self.layoutText[:])
+        """
+        A copy of the layout.  Nothing in a layout changes once it is
+        compiled, so the copy shares all of its parts with this one.
+        """
+        layout = copy.copy(self)
+        layout.layoutText = self.layoutText[:]
+        return layout
 
     def processLayoutText(self, layoutText):
         """
@@ -129,21 +277,24 @@ class Layout:
             self.agentPositions.append( (int(layoutChar), (x,y)))
             self.numGhosts += 1
 def getLayout(name, back = 2):
+    """
+    Loads the named layout from layouts/ or the current directory, or from
+    the same places in up to back + 1 directories above.  The directories
+    above are reached through relative paths rather than by changing the
+    working directory, which is shared by every thread.
+    """
     if name.endswith('.lay'):
-        layout = tryToLoad('layouts/' + name)
-        if layout == None: layout = tryToLoad(name)
+        names = [os.path.join('layouts', name), name]
     else:
-        layout = tryToLoad('layouts/' + name + '.lay')
-        if layout == None: layout = tryToLoad(name + '.lay')
-    if layout == None and back >= 0:
-        curdir = os.path.abspath('.')
-        os.chdir('..')
-        layout = getLayout(name, back -1)
-        os.chdir(curdir)
-    return layout
+        names = [os.path.join('layouts', name + '.lay'), name + '.lay']
+    for up in range(back + 2):
+        for fullname in names:
+            layout = tryToLoad(os.path.join(*([os.pardir] * up + [fullname])))
+            if layout != None: return layout
+    return None
 
 def tryToLoad(fullname):
     if(not os.path.exists(fullname)): return None
     f = open(fullname)
-    try: return Layout([line.strip() for line in f])
+    try: return Layout([line.strip() for line in f], fullname)
     finally: f.close()
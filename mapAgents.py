@@ -33,77 +33,9 @@ import random
 import game
 import util
 import sys
-
-#
-# A class that creates a grid that can be used as a map
-#
-# The map itself is implemented as a nested list, and the interface
-# allows it to be accessed by specifying x, y locations.
-#
-class Grid:
-         
-    # Constructor
-    #
-    # Note that it creates variables:
-    #
-    # grid:   an array that has one position for each element in the grid.
-    # width:  the width of the grid
-    # height: the height of the grid
-    #
-    # Grid elements are not restricted, so you can place whatever you
-    # like at each location. You just have to be careful how you
-    # handle the elements when you use them.
-    def __init__(self, width, height):
-        self.width = width
-        self.height = height
-        subgrid = []
-        for i in range(self.height):
-            row=[]
-            for j in range(self.width):
-                row.append(0)
-            subgrid.append(row)
-
-        self.grid = subgrid
-
-    # Print the grid out.
-    def display(self):       
-        for i in range(self.height):
-            for j in range(self.width):
-                # print grid elements with no newline
-                print self.grid[i][j],
-            # A new line after each line of the grid
-            print 
-        # A line after the grid
-        print
-
-    # The display function prints the grid out upside down. This
-    # prints the grid out so that it matches the view we see when we
-    # look at Pacman.
-    def prettyDisplay(self):       
-        for i in range(self.height):
-            for j in range(self.width):
-                # print grid elements with no newline
-                print self.grid[self.height - (i + 1)][j],
-            # A new line after each line of the grid
-            print 
-        # A line after the grid
-        print
-        
-    # Set and get the values of specific elements in the grid.
-    # Here x and y are indices.
-    def setValue(self, x, y, value):
-        self.grid[y][x] = value
-
-    def getValue(self, x, y):
-        return self.grid[y][x]
-
-    # Return width and height to support functions that manipulate the
-    # values stored in the grid.
-    def getHeight(self):
-        return self.height
-
-    def getWidth(self):
-        return self.width
+import time
+import valueIteration
+from numericGrid import NumericGrid
 
 #
 # An agent that creates a map.
@@ -117,25 +49,67 @@ class MapAgent(Agent):
 
     # The constructor. We don't use this to create the map because it
     # doesn't have access to state information.
-    def __init__(self):
+    #
+    # epsilon and budget work as for MDPAgent: if either is given, value
+    # iteration stops once no square changes by more than epsilon in a
+    # sweep, or after budget seconds. So does background: with it, value
+    # iteration goes on in between moves on a thread of its own. And so
+    # does scaredGhosts: with it, ghosts that will stay scared for a while
+    # yet are no danger.
+    def __init__(self, epsilon=None, budget=None, background=False, scaredGhosts=False):
         print "Running init!"
+        self.epsilon = None
+        self.budget = None
+        if epsilon != None:
+            self.epsilon = float(epsilon)
+        if budget != None:
+            self.budget = float(budget)
+        self.background = background in [True, 'True', 'true', '1']
+        self.worker = None
+        self.scaredGhosts = scaredGhosts in [True, 'True', 'true', '1']
 
     # This function is run when the agent is created, and it has access
     # to state information, so we use it to build a map for the agent.
     def registerInitialState(self, state):
+         # A worker left over from a game that ended without final()
+         # must not sweep the map while it is being replaced
+         self.stopWorker()
          print "Running registerInitialState!"
          # Make a map of the right size
          self.makeMap(state)
          self.addWallsToMap(state)
          self.updateFoodInMap(state)
+         self.transitions = api.transitions(state)
          self.map.display()
-         self.updateUtilities(api.walls(state), api.food(state), api.ghosts(state), 1000)
+         self.sweeps, self.residual = self.updateUtilities(api.wallSet(state), api.foodSet(state), api.ghosts(state), 1000)
+         self.moveStats = []
          self.counter = 0
+         if self.background:
+             walls = api.wallSet(state)
+             sweep = lambda food, ghosts: self.updateUtilities(walls, food, ghosts, 1)[1]
+             epsilon = self.epsilon
+             if epsilon == None:
+                 epsilon = 1e-6
+             # With gemma at 1 the residual may never drop below epsilon,
+             # so the worker stops at the 100 sweeps a move runs without it
+             self.worker = valueIteration.BackgroundWorker(sweep, api.foodSet(state), api.ghosts(state), epsilon, 100)
+             self.worker.start()
+
+    # Stop the background worker, if there is one.
+    def stopWorker(self):
+        if self.worker != None:
+            self.worker.stop()
+            self.worker = None
 
 
     # This is what gets run when the game ends.
     def final(self, state):
         print "Looks like I just died!"
+        self.stopWorker()
+        if len(self.moveStats) > 0:
+            sweeps = [s for (s, r) in self.moveStats]
+            print "Value iteration: %d moves, %.1f sweeps per move, largest final residual %g" % \
+                (len(sweeps), sum(sweeps) / float(len(sweeps)), max([r for (s, r) in self.moveStats]))
 
     # Make a map by creating a grid of the right size
     def makeMap(self,state):
@@ -143,7 +117,7 @@ class MapAgent(Agent):
         print corners
         height = self.getLayoutHeight(corners)
         width  = self.getLayoutWidth(corners)
-        self.map = Grid(width, height)
+        self.map = NumericGrid(width, height)
         
     # Functions to get the height and the width of the grid.
     #
@@ -227,119 +201,70 @@ class MapAgent(Agent):
 
 
      
+    # Runs at most num sweeps, and returns how many were run and the
+    # largest change made to a square in the last one.
     def updateUtilities(self, walls, food, ghosts,num):
 
-        change = True
         currentReward = 10
-
-        # while change == True:
-
-        for i in range(0,num):
+        deadline = None
+        if self.budget != None:
+            deadline = time.time() + self.budget
+        sweeps = 0
+
+        # Work on a flat list of utilities, one per square of the
+        # layout's transition table.
+        table = self.transitions
+        utilities = [self.map.getValue(x, y) for (x, y) in table.squares]
+
+        # The rewards, worked out once for all the sweeps. Ghosts make
+        # the squares around them dangerous, but only their own square
+        # once the food is low.
+        kernel = valueIteration.AROUND
+        if len(food) <= 2:
+            kernel = valueIteration.ON
+        field = valueIteration.RewardField(table, food, ghosts, kernel)
+        foodField = field.food
+        dangerField = field.danger
+
+        for sweep in range(0,num):
 
             gemma = 1
+            sweeps += 1
+            residual = 0.0
             
 
-            for i in range(self.map.getWidth()):
-                for j in range(self.map.getHeight()):
-                    current = self.map.getValue(i, j)
-                    if current != -5:
-                        alist = []
-                        north1 = (i, j+1)
-                        south1 = (i, j-1)
-                        east = (i+1, j)
-                        west = (i-1, j)
-                        oldValue = self.map.getValue(i,j)
-                        wallMap = dict()
-
-                    
-
-
-                      
-
-                        values = []
-
-                        alist.append(north1)
-                        alist.append(south1)
-                        alist.append(east)
-                        alist.append(west)
-
-                        for a in alist:
-                            if a in walls:
-                                wallMap[a] = True
-                            else:
-                                wallMap[a] = False
-
-                          
-
-                        for val in alist:
-                            if val not in walls and val[0] < self.map.getWidth() and val[1] < self.map.getHeight():
-                                
-                                pNorth = 0.1
-                                pSouth = 0.1
-                                pEast = 0.1
-                                pWest = 0.1
-
-                                if wallMap[north1] == True:
-                                    pNorth = 0.1 * self.map.getValue(val[0], val[1])
-                                else:
-                                    pNorth = 0.1 * self.map.getValue(north1[0], north1[1]) 
-
-                                if wallMap[south1] == True:
-                                    pSouth = 0.1 * self.map.getValue(val[0], val[1])
-                                else:
-                                    pSouth =  0.1 * self.map.getValue(south1[0], south1[1])
-
-                                if wallMap[east] == True:
-                                    pEast = 0.1 * self.map.getValue(val[0], val[1])
-                                else:
-                                    pEast = 0.1 * self.map.getValue(east[0],east[1])
-
-                                if wallMap[west] == True:
-                                    pWest = 0.1 * self.map.getValue(val[0], val[1])
-                                else:
-                                    pWest = 0.1 * self.map.getValue(west[0], west[1])
-
-
-                                if val == west or val == east:
-                                    temp =  0.8 * self.map.getValue(val[0], val[1]) + pSouth + pNorth
-                                    values.append(temp)
-
-                                if val == north1 or val == south1:
-                                    temp =  0.8 * self.map.getValue(val[0],val[1]) + pEast + pWest 
-                                    values.append(temp)
-                                            
-                        
-                        #print(values , " -----------------------------------------")        
-                                            
-                        m = max(values)
-                        rightBellman = gemma * m;
-                        reward = -0.1
-                        if (i,j) in food and self.map.getValue(i,j) != 10:
-                            reward = 10
-                        if (i,j) in ghosts or (i+1,j) in ghosts or (i-1,j) in ghosts or (i, j+1) in ghosts or (i,j-1) in ghosts or (i+1, j+1) in ghosts or (i+1, j-1) in ghosts or (i-1, j+1) in ghosts or (i-1, j-1) in ghosts:
-                            # edibleGhosts = api.ghostStatesWithTimer()
-                            # if edibleGhosts[0][1] < 1:
-                            if (len(food) > 2):
-                                reward = -10
-                            else:
-                                if (i,j) in ghosts:
-                                    reward = -10   
+            for k in range(table.size()):
+                oldValue = utilities[k]
 
-                            
+                # Expected utility of each move that isn't into a wall,
+                # from the transition table.
+                values = [value for (action, value) in table.expectedUtilities(utilities, k)]
+                if len(values) == 0:
+                    continue
+                                    
+                m = max(values)
+                rightBellman = gemma * m;
+                reward = -0.1
+                if foodField[k] and oldValue != 10:
+                    reward = 10
+                if dangerField[k]:
+                    reward = -10
 
+                leftBellman = reward + rightBellman
 
-                                
+                residual = max(residual, abs(leftBellman - oldValue))
 
-                        leftBellman = reward + rightBellman
+                utilities[k] = leftBellman
 
-                        if oldValue == leftBellman:
-                            #print "----------------------old value and new value is the same-------------------"
-                            change = False
-                        else:
-                            change = True    
+            if self.epsilon != None and residual <= self.epsilon:
+                break
+            if deadline != None and time.time() >= deadline:
+                break
 
+        for k in range(table.size()):
+            self.map.setValue(table.squares[k][0], table.squares[k][1], utilities[k])
 
-                        self.map.setValue(i,j,leftBellman)    
+        return sweeps, residual
 
 
 
@@ -396,7 +321,18 @@ class MapAgent(Agent):
 
  
     # For now I just move randomly, but I display the map to show my progress
+    # The background worker, if there is one, is paused while the move
+    # is worked out, as that reads and writes the map.
     def getAction(self, state):
+        if self.worker == None:
+            return self.decideAction(state)
+        self.worker.pause()
+        try:
+            return self.decideAction(state)
+        finally:
+            self.worker.resume()
+
+    def decideAction(self, state):
         #self.updateFoodInMap(state)
         self.map.prettyDisplay()
 
@@ -404,22 +340,34 @@ class MapAgent(Agent):
 
 
 
-        walls = api.walls(state)
+        walls = api.wallSet(state)
         corners = api.corners(state)
         legal = api.legalActions(state)
         pacman = api.whereAmI(state)
-        theFood = api.food(state)
+        theFood = api.foodSet(state)
         west = Directions.WEST
         east = Directions.EAST
         south = Directions.SOUTH
         north = Directions.NORTH
         ghostArray = api.ghosts(state)
-        food = api.food(state)
+        if self.scaredGhosts:
+            ghostArray = valueIteration.dangerousGhosts(ghostArray, api.ghostStatesWithTimes(state))
+        food = api.foodSet(state)
         
 
         # if self.counter > 100 or len(food) <= 2:
         #     self.counter = 0
-        self.updateUtilities(walls, theFood, ghostArray, 100)
+        # The background worker, if there is one, has done the sweeps
+        # already and only needs to know what has changed.
+        if self.worker == None:
+            self.sweeps, self.residual = self.updateUtilities(walls, theFood, ghostArray, 100)
+        else:
+            # Its map is a move behind, so run a few sweeps with what
+            # Pacman sees now
+            self.sweeps, self.residual = self.worker.update(theFood, ghostArray)
+            fresh, self.residual = self.updateUtilities(walls, theFood, ghostArray, 4)
+            self.sweeps += fresh
+        self.moveStats.append((self.sweeps, self.residual))
 
 
 
@@ -438,9 +386,7 @@ class MapAgent(Agent):
         mapOfLegal = dict()
         distances = []
         moves = []
-        alist = []
         moveToCoordMap = dict()
-        wallMap = dict()
 
         if Directions.STOP in legal:
             legal.remove(Directions.STOP)
@@ -476,63 +422,11 @@ class MapAgent(Agent):
                 moveToCoordMap[south] = southCoord          
 
 
-        values = []
-
-        alist.append(northCoord)
-        alist.append(southCoord)
-        alist.append(eastCoord)
-        alist.append(westCoord)
-
-        for a in alist:
-            if a in walls:
-                wallMap[a] = True
-            else:
-                wallMap[a] = False
-
-
-
-          
-
-        for val in alist:
-            if val not in walls and val[0] < self.map.getWidth() and val[1] < self.map.getHeight():
-                pNorth = 0.1
-                pSouth = 0.1
-                pEast = 0.1
-                pWest = 0.1
-
-                if wallMap[northCoord] == True:
-                    pNorth = 0.1 * self.map.getValue(val[0], val[1])
-                else:
-                    pNorth = 0.1 * self.map.getValue(northCoord[0], northCoord[1]) 
-
-                if wallMap[southCoord] == True:
-                    pSouth = 0.1 * self.map.getValue(val[0], val[1])
-                else:
-                    pSouth =  0.1 * self.map.getValue(southCoord[0], southCoord[1])
-
-                if wallMap[eastCoord] == True:
-                    pEast = 0.1 * self.map.getValue(val[0], val[1])
-                else:
-                    pEast = 0.1 * self.map.getValue(eastCoord[0],eastCoord[1])
-
-                if wallMap[westCoord] == True:
-                    pWest = 0.1 * self.map.getValue(val[0], val[1])
-                else:
-                    pWest = 0.1 * self.map.getValue(westCoord[0], westCoord[1])
-
-
-                if val == westCoord:
-                    temp =  0.8 * self.map.getValue(val[0], val[1]) + pNorth + pSouth
-                    values.append((temp, west))
-                if val == eastCoord:
-                    temp =  0.8 * self.map.getValue(val[0], val[1]) + pNorth + pSouth 
-                    values.append( (temp,east ) )
-                if val == northCoord:
-                    temp =  0.8 * self.map.getValue(val[0],val[1]) + pEast + pWest 
-                    values.append((temp, north))
-                if val == southCoord:
-                    temp =  0.8 * self.map.getValue(val[0],val[1]) + pEast + pWest 
-                    values.append((temp, south))
+        # Expected utility of each move that isn't into a wall, using
+        # the transition table.
+        table = self.transitions
+        utilities = [self.map.getValue(x, y) for (x, y) in table.squares]
+        values = [(value, action) for (action, value) in table.expectedUtilities(utilities, table.index[pacman])]
                             
         
 
@@ -0,0 +1,137 @@
+# mazeDistances.py
+# ----------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+"""
+True distances through the maze, as opposed to util.manhattanDistance,
+which ignores the walls.
+
+MazeDistances works out the distance between every pair of open squares of
+a layout once, by a breadth first search from each one, so that looking
+one up afterwards takes constant time.  Layout.getMazeDistances() builds
+them the first time they are asked for and caches them by layout hash.
+"""
+
+from array import array
+from collections import deque
+
+# Stored for squares that can't reach each other
+UNREACHABLE = 65535
+
+class MazeDistances:
+    """
+    The distances between all pairs of open squares of a wall grid.
+
+    Open squares are numbered column by column, and the distance from
+    square i to square j is entry i * n + j of a flat array of n * n
+    unsigned shorts.
+    """
+    def __init__(self, walls=None):
+        self.squares = []
+        self.index = {}
+        self.distances = array('H')
+        if walls != None:
+            self._build(walls)
+
+    def _build(self, walls):
+        for x in range(walls.width):
+            for y in range(walls.height):
+                if not walls[x][y]:
+                    self.index[(x, y)] = len(self.squares)
+                    self.squares.append((x, y))
+        n = len(self.squares)
+        neighbours = []
+        for (x, y) in self.squares:
+            neighbours.append([self.index[square] for square in [(x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)]
+                               if square in self.index])
+
+        distances = array('H', [UNREACHABLE]) * (n * n)
+        for source in range(n):
+            row = source * n
+            distances[row + source] = 0
+            frontier = deque([source])
+            while frontier:
+                square = frontier.popleft()
+                next = distances[row + square] + 1
+                for neighbour in neighbours[square]:
+                    if distances[row + neighbour] == UNREACHABLE:
+                        distances[row + neighbour] = next
+                        frontier.append(neighbour)
+        self.distances = distances
+
+    def __getstate__(self):
+        return (self.squares, self.distances.tostring())
+
+    def __setstate__(self, state):
+        self.squares, data = state
+        self.index = dict([(square, i) for i, square in enumerate(self.squares)])
+        self.distances = array('H')
+        self.distances.fromstring(data)
+
+    def _nearby(self, position):
+        """
+        The open squares a position is on or between, each with how far
+        the position is from it.  Scared ghosts move in half steps, so they
+        can be halfway between two squares.
+        """
+        x, y = position
+        if x == int(x) and y == int(y):
+            return [((int(x), int(y)), 0)]
+        nearby = []
+        for square in set([(int(x), int(y)), (int(x + 0.5), int(y + 0.5))]):
+            nearby.append((square, abs(square[0] - x) + abs(square[1] - y)))
+        return nearby
+
+    def getDistance(self, a, b):
+        """
+        The length of the shortest path from a to b through the maze, or
+        float('inf') if there is none.  Positions may be halfway between
+        squares.  Raises KeyError for a position on a wall or off the map.
+        """
+        n = len(self.squares)
+        if a in self.index and b in self.index:
+            distance = self.distances[self.index[a] * n + self.index[b]]
+            if distance == UNREACHABLE: return float('inf')
+            return distance
+
+        starts = self._open(a)
+        ends = self._open(b)
+        best = float('inf')
+        for square, offset in starts:
+            row = self.index[square] * n
+            for other, otherOffset in ends:
+                distance = self.distances[row + self.index[other]]
+                if distance != UNREACHABLE:
+                    best = min(best, distance + offset + otherOffset)
+        return best
+
+    def _open(self, position):
+        """
+        The open squares near position (see _nearby).  Raises KeyError if
+        there are none.
+        """
+        nearby = [(square, offset) for square, offset in self._nearby(position) if square in self.index]
+        if not nearby: raise KeyError(position)
+        return nearby
+
+    def getDistancesFrom(self, a):
+        """
+        A dictionary from every square reachable from square a to its
+        distance.
+        """
+        n = len(self.squares)
+        row = self.index[a] * n
+        distances = {}
+        for j in range(n):
+            if self.distances[row + j] != UNREACHABLE:
+                distances[self.squares[j]] = self.distances[row + j]
+        return distances
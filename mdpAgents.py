@@ -33,77 +33,9 @@ import random
 import game
 import util
 import sys
-
-#
-# A class that creates a grid that can be used as a map
-#
-# The map itself is implemented as a nested list, and the interface
-# allows it to be accessed by specifying x, y locations.
-#
-class Grid:
-         
-    # Constructor
-    #
-    # Note that it creates variables:
-    #
-    # grid:   an array that has one position for each element in the grid.
-    # width:  the width of the grid
-    # height: the height of the grid
-    #
-    # Grid elements are not restricted, so you can place whatever you
-    # like at each location. You just have to be careful how you
-    # handle the elements when you use them.
-    def __init__(self, width, height):
-        self.width = width
-        self.height = height
-        subgrid = []
-        for i in range(self.height):
-            row=[]
-            for j in range(self.width):
-                row.append(0)
-            subgrid.append(row)
-
-        self.grid = subgrid
-
-    # Print the grid out.
-    def display(self):       
-        for i in range(self.height):
-            for j in range(self.width):
-                # print grid elements with no newline
-                print self.grid[i][j],
-            # A new line after each line of the grid
-            print 
-        # A line after the grid
-        print
-
-    # The display function prints the grid out upside down. This
-    # prints the grid out so that it matches the view we see when we
-    # look at Pacman.
-    def prettyDisplay(self):       
-        for i in range(self.height):
-            for j in range(self.width):
-                # print grid elements with no newline
-                print self.grid[self.height - (i + 1)][j],
-            # A new line after each line of the grid
-            print 
-        # A line after the grid
-        print
-        
-    # Set and get the values of specific elements in the grid.
-    # Here x and y are indices.
-    def setValue(self, x, y, value):
-        self.grid[y][x] = value
-
-    def getValue(self, x, y):
-        return self.grid[y][x]
-
-    # Return width and height to support functions that manipulate the
-    # values stored in the grid.
-    def getHeight(self):
-        return self.height
-
-    def getWidth(self):
-        return self.width
+import time
+from numericGrid import NumericGrid
+import valueIteration
 
 #
 # An agent that creates a map.
@@ -115,38 +47,208 @@ class Grid:
 #
 class MDPAgent(Agent):
 
+    # The value iteration engines that can be picked with -a engine=...
+    #
+    # 'python' is the per-cell loop in updateUtilities below, 'numpy' is
+    # the vectorised version of the same update in valueIteration.py,
+    # and 'sweeping' only updates the squares affected by what changed
+    # since the last move (prioritized sweeping).
+    ENGINES = {'python': None,
+               'numpy': valueIteration.NumpyEngine,
+               'sweeping': valueIteration.SweepingEngine}
+
+    # How long a move may take before the game warns about it, until the
+    # game says otherwise: what ClassicGameRules allows by default
+    MOVE_WARNING_TIME = 30
+
+    # With a background worker, the sweeps run before each move with what
+    # Pacman sees then, as the worker's map is a move behind
+    FRESH_SWEEPS = 4
+
+    # The fraction of the move warning time a move gets in anytime
+    # mode, unless it is given
+    ANYTIME = 0.5
+
+    # The most sweeps a move runs in anytime mode, in case the clock
+    # never gets to the deadline
+    ANYTIME_SWEEPS = 100000
+
+    # The most sweeps the background worker runs between two moves: as
+    # many as a move runs without it, once food is low
+    BACKGROUND_SWEEPS = 100
+
     # The constructor. We don't use this to create the map because it
     # doesn't have access to state information.
-    def __init__(self):
+    #
+    # Giving epsilon and/or budget (both come in from -a as strings)
+    # switches on convergence mode: value iteration still runs at most
+    # the usual 50 sweeps a move (100 once food is low), but stops as
+    # soon as the largest change a sweep makes to the map (the Bellman
+    # residual) is at most epsilon, or budget seconds have gone by. So
+    # a move never costs more sweeps than it did without them, unless
+    # anytime is given too.
+    #
+    # policyCache, if given, is how many moves to remember. Pacman often
+    # comes back to a square while the food and the squares near the
+    # ghosts are just as they were, and then the move worked out last
+    # time is used again rather than worked out from the map. The food
+    # and the squares near the ghosts are part of the key, so a move is
+    # only used again with the rewards it was worked out for, and the
+    # least recently used moves make way for new ones.
+    #
+    # anytime switches on anytime mode: True for ANYTIME, or the
+    # fraction of the game's move warning time (see setMoveWarningTime)
+    # that each move gets. Value iteration no longer stops at the usual
+    # sweeps, but carries on until that time is up (or budget seconds,
+    # if given), or a sweep changes no square by more than epsilon (or
+    # at all, without epsilon), then Pacman moves on the utilities it
+    # has got to. It is a budget that scales with the game's rules.
+    #
+    # background=True keeps value iteration going on a thread of its own
+    # between moves (see valueIteration.BackgroundWorker), so a move only
+    # has to read the map.
+    #
+    # scaredGhosts=True uses the ghosts' scared timers: a ghost that will
+    # stay scared for more than valueIteration.SCARED_MARGIN moves is
+    # left out of the ghost penalty.
+    def __init__(self, engine='python', epsilon=None, budget=None, policyCache=None, anytime=None, background=False,
+                 scaredGhosts=False):
         print "Running init!"
+        if engine not in MDPAgent.ENGINES:
+            raise Exception('Unknown value iteration engine ' + str(engine))
+        self.engineName = engine
+        self.epsilon = None
+        self.budget = None
+        if epsilon != None:
+            self.epsilon = float(epsilon)
+        if budget != None:
+            self.budget = float(budget)
+        self.anytime = None
+        if anytime in [True, 'True', 'true']:
+            self.anytime = MDPAgent.ANYTIME
+        elif anytime != None:
+            self.anytime = float(anytime)
+            if not 0 < self.anytime <= 1:
+                raise Exception('anytime is a fraction of the move warning time, so between 0 and 1')
+        self.moveWarningTime = MDPAgent.MOVE_WARNING_TIME
+        self.policyCacheSize = None
+        if policyCache != None:
+            self.policyCacheSize = int(policyCache)
+        self.background = background in [True, 'True', 'true', '1']
+        self.worker = None
+        self.scaredGhosts = scaredGhosts in [True, 'True', 'true', '1']
+
+    # The game calls this before the start, with how many seconds a
+    # move can take before the game warns about it.
+    def setMoveWarningTime(self, seconds):
+        self.moveWarningTime = seconds
 
     # This function is run when the agent is created, and it has access
     # to state information, so we use it to build a map for the agent.
     def registerInitialState(self, state):
+         # A worker left over from a game that ended without final()
+         # must not sweep the map while it is being replaced
+         self.stopWorker()
          print "Running registerInitialState!"
          # Make a map of the right size
          self.makeMap(state)
          self.addWallsToMap(state)
          self.updateFoodInMap(state)
+         # The transition table for this layout, shared with the engines
+         self.transitions = api.transitions(state)
+         self.makeEngine(state)
          self.map.display()
          #Run the value iteration 1000 times at the start as it will stabilise the values for later on
-         self.updateUtilities(api.walls(state), api.food(state), api.ghosts(state), 1000, state)
+         self.sweeps, self.residual, timedOut = self.updateUtilities(api.wallSet(state), api.foodSet(state), api.ghosts(state), 1000, state, self.epsilon, self.getDeadline())
+         # The number of sweeps, the final residual and whether the
+         # deadline stopped value iteration, for every move
+         self.moveStats = []
          self.counter = 0
+         # Moves worked out for the rewards of the last value iteration
+         self.policyCache = None
+         if self.policyCacheSize != None:
+             self.policyCache = util.LRUCache(self.policyCacheSize)
+         self.rewardKey = None
+         # Carry on sweeping in the background from here
+         if self.background:
+             walls = api.wallSet(state)
+             sweep = lambda food, ghosts: self.updateUtilities(walls, food, ghosts, 1, None)[1]
+             epsilon = self.epsilon
+             if epsilon == None:
+                 epsilon = 1e-6
+             self.worker = valueIteration.BackgroundWorker(sweep, api.foodSet(state), api.ghosts(state), epsilon,
+                                                           MDPAgent.BACKGROUND_SWEEPS)
+             self.worker.start()
+
+    # Stop the background worker, if there is one.
+    def stopWorker(self):
+        if self.worker != None:
+            self.worker.stop()
+            self.worker = None
        
 
 
     # This is what gets run when the game ends.
     def final(self, state):
         print "Looks like I just died!"
+        self.stopWorker()
+        self.printMoveStats()
+        self.printPolicyCacheStats()
         self.counter = 0
 
+    # Say how much value iteration each move needed.
+    def printMoveStats(self):
+        if len(self.moveStats) == 0:
+            return
+        sweeps = [s for (s, r, h) in self.moveStats]
+        residuals = [r for (s, r, h) in self.moveStats]
+        print "Value iteration: %d moves, %.1f sweeps per move (min %d, max %d), largest final residual %g" % \
+            (len(sweeps), sum(sweeps) / float(len(sweeps)), min(sweeps), max(sweeps), max(residuals))
+        if self.getBudget() != None:
+            hits = len([h for (s, r, h) in self.moveStats if h])
+            print "Deadline of %.3fs reached on %d of %d moves (%.1f%%)" % \
+                (self.getBudget(), hits, len(sweeps), 100.0 * hits / len(sweeps))
+
+    # Say how often the policy cache saved working out a move.
+    def printPolicyCacheStats(self):
+        if self.policyCache == None:
+            return
+        cache = self.policyCache
+        print "Policy cache: %d hits in %d moves (%.1f%%), %d entries" % \
+            (cache.hits, cache.hits + cache.misses, 100 * cache.hitRate(), len(cache))
+
+    # How many seconds value iteration gets per move, or None if it
+    # isn't limited. A budget given in seconds wins over anytime.
+    def getBudget(self):
+        if self.budget != None:
+            return self.budget
+        if self.anytime != None:
+            return self.anytime * self.moveWarningTime
+        return None
+
+    # When value iteration has to stop if there is a time budget.
+    def getDeadline(self):
+        budget = self.getBudget()
+        if budget == None:
+            return None
+        return time.time() + budget
+
+    # Create the value iteration engine chosen in the constructor. It
+    # works from the transition table of the layout.
+    def makeEngine(self, state):
+        engineClass = MDPAgent.ENGINES[self.engineName]
+        if engineClass == None:
+            self.engine = None
+        else:
+            self.engine = engineClass(self.transitions)
+
     # Make a map by creating a grid of the right size
     def makeMap(self,state):
         corners = api.corners(state)
         print corners
         height = self.getLayoutHeight(corners)
         width  = self.getLayoutWidth(corners)
-        self.map = Grid(width, height)
+        self.map = NumericGrid(width, height)
         
     # Functions to get the height and the width of the grid.
     #
@@ -192,285 +294,189 @@ class MDPAgent(Agent):
 
     #This is the main method which applies value iteration and can be thought of as the MDP Solver
     # @param self : passed implicitly, used to call functions within the object
-    # @param walls: walls array
-    # @param food : food array in the current state
+    # @param walls: set of wall positions
+    # @param food : set of food positions in the current state
     # @param ghosts : ghost array in the current state
     # @param num : number of times value iteration must be run - Value iteration will always be run num + 1 times
     # @param state : current state
+    # @param epsilon : if given, stop once a sweep changes no square by more than this
+    # @param deadline : if given, stop once time.time() passes this
+    # @returns the number of sweeps run, the residual (largest change to a square) of the last one,
+    #          and whether the deadline stopped it before num sweeps
      
-    def updateUtilities(self, walls, food, ghosts,num, state):
+    def updateUtilities(self, walls, food, ghosts,num, state, epsilon=None, deadline=None):
+
+        # Let the engine do the sweeps if one was picked
+        if self.engine != None:
+            return self.engine.updateUtilities(self.map, food, ghosts, num, epsilon, deadline)
+
+        sweeps = 0
+        residual = 0.0
+        timedOut = False
+
+        #The transition table gives, for every square that isn't a wall, where each move can end up
+        #Utilities are kept in a flat list indexed like the squares of the table while we sweep
+        table = self.transitions
+        utilities = [self.map.getValue(x, y) for (x, y) in table.squares]
+
+        #Food and ghosts don't move during the sweeps, so their rewards are worked out once
+        field = valueIteration.RewardField(table, food, ghosts)
+        foodField = field.food
+        dangerField = field.danger
 
         # Outer most loop which decides how many times value iteration must be run
-        for i in range(0,num):
+        for sweep in range(0,num):
+
+            sweeps += 1
+            residual = 0.0
 
             #gemma value to feed into bellman equation
             gemma = 0.1
             
-            #Iterate over the map and get each square which isnt a wall, wall is represented as -5
-            for i in range(self.map.getWidth()):
-                for j in range(self.map.getHeight()):
-                    #get the current value
-                    current = self.map.getValue(i, j)
-                    #check that its not a wall
-                    if current != -5:
-                        # Look at all neighbouring states which the pacman can go to 
-                        north1 = (i, j+1)
-                        south1 = (i, j-1)
-                        east = (i+1, j)
-                        west = (i-1, j)
-
-
-                        #A list to keep all neighbouring states
-                        coordinatesForNeighbourStates = []
-                      
-                        # A map to check which neighbours are the walls
-                        wallMap = dict()
-
-                    
-                        # A list to store the values of all possible outcomes and for bellman to pick the maximum value from this list
-                        values = []
-
-                        # Add all neighbours to the list
-                        coordinatesForNeighbourStates.append(north1)
-                        coordinatesForNeighbourStates.append(south1)
-                        coordinatesForNeighbourStates.append(east)
-                        coordinatesForNeighbourStates.append(west)
-
-
-                        #Set which of the neighbors are walls and which ones are actually squares - Simple boolean representation
-                        # True means a neighbor is a wall and False means its not a wall
-                        for coord in coordinatesForNeighbourStates:
-                            if coord in walls:
-                                wallMap[coord] = True
-                            else:
-                                wallMap[coord] = False
-
-                          
-                        #Iterate over all neighbors
-                        for val in coordinatesForNeighbourStates:
-                            #Check that the neighbour is not a wall and it is within the grid
-                            if val not in walls and val[0] < self.map.getWidth() and val[1] < self.map.getHeight():
-                                
-                                #Initialise the probabbilities for ending up in neighbouring state
-                                pNorth = 0.1
-                                pSouth = 0.1
-                                pEast = 0.1
-                                pWest = 0.1
-
-                                #Compute for each of the neighburing state, the maximum expected utility,
-                                # as with a wall it will end up in the current state, otherwise take the value from the neighbour state
-                                # Do this for all neighbours (except walls) 
-                                if wallMap[north1] == True:
-                                    pNorth = 0.1 * self.map.getValue(val[0], val[1])
-                                else:
-                                    pNorth = 0.1 * self.map.getValue(north1[0], north1[1]) 
-
-                                if wallMap[south1] == True:
-                                    pSouth = 0.1 * self.map.getValue(val[0], val[1])
-                                else:
-                                    pSouth =  0.1 * self.map.getValue(south1[0], south1[1])
-
-                                if wallMap[east] == True:
-                                    pEast = 0.1 * self.map.getValue(val[0], val[1])
-                                else:
-                                    pEast = 0.1 * self.map.getValue(east[0],east[1])
-
-                                if wallMap[west] == True:
-                                    pWest = 0.1 * self.map.getValue(val[0], val[1])
-                                else:
-                                    pWest = 0.1 * self.map.getValue(west[0], west[1])
-
-                                #Compute the MEU for a move which is whether west or east, as it can end up in south or north with a probability of 0.1
-                                if val == west or val == east:
-                                    temp =  0.8 * self.map.getValue(val[0], val[1]) + pSouth + pNorth
-                                    values.append(temp)
-                                #Compute the EU for north or south move, it can end up in east or south and the case if east/west is a wall it will end up in the same state
-                                if val == north1 or val == south1:
-                                    temp =  0.8 * self.map.getValue(val[0],val[1]) + pEast + pWest 
-                                    values.append(temp)
-                                            
-                        
-                             
-                        #Get the maximum value from the above computed values                     
-                        m = max(values)
-
-                        #Get the right hand side of bellman 
-                        rightBellman = gemma * m;
-
-                        #initiate the reward to -0.1
-                        reward = -0.1
-                        #Decide what the reward will be based on whether there is Food/ghosts in that square. 
-                        # Its kept in mind that neighbours of the ghost state are as deadly as the ghost state itself
-                        # since ghosts move and they will be in one of its  neighbour states next, hence pacman should avoid 
-                        # not just ghost squares but its neighbours too. 
-
-                        #Check that the the current sqaure has food and does not have the reward already
-                        if (i,j) in food and self.map.getValue(i,j) != 10:
-                            reward = 10
-
-                        #Check that the current square or any of its neighbours do not hace a ghosts in it
-                        if (i,j) in ghosts or (i+1,j) in ghosts or (i-1,j) in ghosts or (i, j+1) in ghosts or (i,j-1) in ghosts or (i+1, j+1) in ghosts or (i+1, j-1) in ghosts or (i-1, j+1) in ghosts or (i-1, j-1) in ghosts:    
-                            # When the food is low and ghosts are near the food then all neighbours cannot be negatives rewards
-                            if (len(food) > 2):
-                                reward = -10
-                            else:
-                                #Food is low and ghost should be avoided but food should be eaten hence only consider adjacent neighbours
-                                if (i,j) in ghosts or (i+1,j) in ghosts or (i-1,j) in ghosts or (i, j+1) in ghosts or (i,j-1) in ghosts:
-                                    # set the reward to -10
-                                    reward = -10   
-
-                                                            
-                        #final bellman value      
-                        bellman = reward + rightBellman  
-
-                        #set the sqaure value to the bellman value
-                        self.map.setValue(i,j,bellman)    
+            #Iterate over each square which isnt a wall, column by column
+            for k in range(table.size()):
+                #get the current value
+                current = utilities[k]
+
+                #The expected utility of each move pacman can make from here. The table takes care of
+                #the 0.1 chance of slipping either side, and of bouncing back off a wall when slipping
+                values = [value for (action, value) in table.expectedUtilities(utilities, k)]
+
+                #A square with no way out has nothing to update
+                if len(values) == 0:
+                    continue
+
+                #Get the maximum value from the above computed values                     
+                m = max(values)
+
+                #Get the right hand side of bellman 
+                rightBellman = gemma * m;
+
+                #initiate the reward to -0.1
+                reward = -0.1
+                #Decide what the reward will be based on whether there is Food/ghosts in that square, from the
+                #reward field worked out before the sweeps (see valueIteration.RewardField). Its kept in mind that
+                #neighbours of the ghost state are as deadly as the ghost state itself since ghosts move and they
+                #will be in one of its neighbour states next, and that when the food is low only the adjacent
+                #neighbours count, so that the last food can still be eaten.
+
+                #Check that the the current sqaure has food and does not have the reward already
+                if foodField[k] and current != 10:
+                    reward = 10
+
+                #Check that the current square is not too close to a ghost
+                if dangerField[k]:
+                    reward = -10
+
+                #final bellman value      
+                bellman = reward + rightBellman  
+
+                #keep track of the largest change this sweep
+                residual = max(residual, abs(bellman - current))
+
+                #set the sqaure value to the bellman value
+                utilities[k] = bellman
 
+            #Stop early if the utilities have converged or time is up
+            if epsilon != None and residual <= epsilon:
+                break
+            if deadline != None and time.time() >= deadline:
+                timedOut = sweeps < num
+                break
+
+        #Put the new utilities back in the map
+        for k in range(table.size()):
+            self.map.setValue(table.squares[k][0], table.squares[k][1], utilities[k])
+
+        return sweeps, residual, timedOut
 
     # A utility method which decides how many times value iteration must be called based on the amount of food remaining in the grid
     # The less the food, the more number of times it will take to get a good policy (in restricted time)
+    # In convergence mode the number of sweeps is only a cap, and the residual or the deadline can stop it sooner
+    # In anytime mode it sweeps until the deadline, or until the map settles, whatever the food
+    # With a background worker the sweeps have been run already, and the
+    # worker just gets the new food and ghosts.
     def valueIteration(self, walls, food, ghostArray, state):
-        if (len(food) < 3):
-            self.updateUtilities(walls, food, ghostArray, 100, state)
+        if self.worker != None:
+            self.sweeps, self.residual = self.worker.update(food, ghostArray)
+            fresh, self.residual, timedOut = self.updateUtilities(walls, food, ghostArray, MDPAgent.FRESH_SWEEPS, state)
+            self.sweeps += fresh
+            self.moveStats.append((self.sweeps, self.residual, False))
+            self.noteRewards(food, ghostArray)
+            return
+        epsilon = self.epsilon
+        if self.anytime != None:
+            num = MDPAgent.ANYTIME_SWEEPS
+            if epsilon == None:
+                epsilon = 0.0
+        elif (len(food) < 3):
+            num = 100
         else:
-            self.updateUtilities(walls, food, ghostArray, 50, state)
+            num = 50
+        self.sweeps, self.residual, timedOut = self.updateUtilities(walls, food, ghostArray, num, state, epsilon, self.getDeadline())
+        self.moveStats.append((self.sweeps, self.residual, timedOut))
+        self.noteRewards(food, ghostArray)
+
+    # The rewards are fixed by the food and the squares near the
+    # ghosts, so that is what the moves in the cache are kept under.
+    # Moves cached for other rewards stay, as the same rewards often
+    # come round again.
+    def noteRewards(self, food, ghostArray):
+        if self.policyCache != None:
+            self.rewardKey = (food, frozenset(valueIteration.dangerSquares(food, ghostArray)))
 
 
     # The function which calculates the next move by applying MEU formula on the current sqaure to find the best move
-    # It follows the same structure as updateUtilities function
+    # It uses the same transition table as updateUtilities
     # @returns a direction, ie Directions.West
 
     def getNextMoveBasedOnMEU(self, state):
 
         #Initialise all varibles with data from the api
-        walls = api.walls(state)
         legal = api.legalActions(state)
         pacman = api.whereAmI(state)
-        west = Directions.WEST
-        east = Directions.EAST
-        south = Directions.SOUTH
-        north = Directions.NORTH
         ghostArray = api.ghosts(state)
-        food = api.food(state)
-
-
-        # Initialise all the lists and maps
-        coordinatesForLegalMoves = []
-        mapOfLegalCoordinatesToDirection = dict()
-        coordinatesForNeighbourStates = []
-        directionToCoordinateMap = dict()
-        wallMap = dict()
+        table = self.transitions
 
         #Remove STOP move from legal if it exists
         if Directions.STOP in legal:
             legal.remove(Directions.STOP)
 
-        #Find the coordinates for neighbour states of pacman - they all represent a potential move 
-        westCoord = (pacman[0]-1, pacman[1])
-        eastCoord = (pacman[0]+1, pacman[1])  
-        northCoord =  (pacman[0], pacman[1]+1)
-        southCoord = (pacman[0], pacman[1]-1)
-
         #reset the value of the map of pacman's position since pacman visisted the state
         self.map.setValue(pacman[0],pacman[1], 1)
 
-        #Iterate over the legal moves and update the maps to have a representation of the neighbour states in maps
-        for l in legal:
-            #check for each possible move and update the map accordingly
-            if l == west:
-                coordinatesForLegalMoves.append(westCoord)
-                mapOfLegalCoordinatesToDirection[westCoord] = west
-                directionToCoordinateMap[west] = westCoord
-            if l == east:
-                coordinatesForLegalMoves.append(eastCoord) 
-                mapOfLegalCoordinatesToDirection[eastCoord] = east
-                directionToCoordinateMap[east] = eastCoord
-            if l == north:
-                coordinatesForLegalMoves.append(northCoord)
-                mapOfLegalCoordinatesToDirection[northCoord] = north
-                directionToCoordinateMap[north] = northCoord
-            if l == south:
-                coordinatesForLegalMoves.append(southCoord)
-                mapOfLegalCoordinatesToDirection[southCoord] = south
-                directionToCoordinateMap[south] = southCoord          
-
-
-        values = []
-
-        #Add all neighbours to the list
-        coordinatesForNeighbourStates.append(northCoord)
-        coordinatesForNeighbourStates.append(southCoord)
-        coordinatesForNeighbourStates.append(eastCoord)
-        coordinatesForNeighbourStates.append(westCoord)
-
-        #check which of the neighbour is a wall and set the boolean value in the map accordingly
-        for neighbour in coordinatesForNeighbourStates:
-            if neighbour in walls:
-                wallMap[neighbour] = True
-            else:
-                wallMap[neighbour] = False
- 
-        # for every neighbour check that its not a wall and its within the grid
-        for val in coordinatesForNeighbourStates:
-            if val not in walls and val[0] < self.map.getWidth() and val[1] < self.map.getHeight():
-                #initialise the probabilities
-                pNorth = 0.1
-                pSouth = 0.1
-                pEast = 0.1
-                pWest = 0.1
-
-                #calculate the expected utility based on whether its a wall or not
-                if wallMap[northCoord] == True:
-                    pNorth = 0.1 * self.map.getValue(val[0], val[1])
-                else:
-                    pNorth = 0.1 * self.map.getValue(northCoord[0], northCoord[1]) 
-
-                if wallMap[southCoord] == True:
-                    pSouth = 0.1 * self.map.getValue(val[0], val[1])
-                else:
-                    pSouth =  0.1 * self.map.getValue(southCoord[0], southCoord[1])
-
-                if wallMap[eastCoord] == True:
-                    pEast = 0.1 * self.map.getValue(val[0], val[1])
-                else:
-                    pEast = 0.1 * self.map.getValue(eastCoord[0],eastCoord[1])
-
-                if wallMap[westCoord] == True:
-                    pWest = 0.1 * self.map.getValue(val[0], val[1])
-                else:
-                    pWest = 0.1 * self.map.getValue(westCoord[0], westCoord[1])
-
-                #for each possible move, calculate the expected utility
-                if val == westCoord:
-                    temp =  0.8 * self.map.getValue(val[0], val[1]) + pNorth + pSouth
-                    values.append((temp, west))
-                if val == eastCoord:
-                    temp =  0.8 * self.map.getValue(val[0], val[1]) + pNorth + pSouth 
-                    values.append( (temp,east ) )
-                if val == northCoord:
-                    temp =  0.8 * self.map.getValue(val[0],val[1]) + pEast + pWest 
-                    values.append((temp, north))
-                if val == southCoord:
-                    temp =  0.8 * self.map.getValue(val[0],val[1]) + pEast + pWest 
-                    values.append((temp, south))
-                            
-        
-
-        #initialisation of variables to record the maximum value and move 
-        maximum = -10
-        moveToMake = random.choice(legal)
+        #use the move worked out last time pacman was here with the same rewards, if there is one
+        moveToMake = None
+        if self.policyCache != None:
+            key = (pacman,) + self.rewardKey
+            moveToMake = self.policyCache.get(key)
+
+        if moveToMake == None:
+            #calculate the expected utility of every move that doesn't walk into a wall, in the order North, South, East, West
+            #only the squares the moves can end up on are read from the map
+            k = table.index[pacman]
+            utilities = {}
+            for j in table.successors[12 * k:12 * k + 12]:
+                utilities[j] = self.map.getValue(table.squares[j][0], table.squares[j][1])
+            values = [(value, action) for (action, value) in table.expectedUtilities(utilities, k)]
+
+            #initialisation of variables to record the maximum value and move 
+            maximum = -10
+            moveToMake = random.choice(legal)
       
-        # Find the maximum value from the list of expected utilities
-        for m in values:
-            if m[0] > maximum:
-                maximum = m[0]
-                moveToMake = m[1]
+            # Find the maximum value from the list of expected utilities
+            for m in values:
+                if m[0] > maximum:
+                    maximum = m[0]
+                    moveToMake = m[1]
 
+            if self.policyCache != None:
+                self.policyCache.put(key, moveToMake)
 
         #check with the map that the move calculated will not kill pacman and if it wont then proceed with returning it
         deathMove = False
         for g in ghostArray:
-            if directionToCoordinateMap[moveToMake] == g:
+            if table.squares[table.neighbours[4 * table.index[pacman] + api.actions.index(moveToMake)]] == g:
                 deathMove = True
     
         if deathMove == False:
@@ -485,12 +491,26 @@ class MDPAgent(Agent):
         #return the best direction
         return direction
     
+    # The background worker, if there is one, is paused while the move
+    # is worked out, as that reads and writes the map.
     def getAction(self, state):
+        if self.worker == None:
+            return self.decideAction(state)
+        self.worker.pause()
+        try:
+            return self.decideAction(state)
+        finally:
+            self.worker.resume()
+
+    def decideAction(self, state):
         
         #Initialise all variables
-        walls = api.walls(state)
+        walls = api.wallSet(state)
         ghostArray = api.ghosts(state)
-        food = api.food(state)
+        if self.scaredGhosts:
+            #Ghosts that will be scared for a while yet are no danger
+            ghostArray = valueIteration.dangerousGhosts(ghostArray, api.ghostStatesWithTimes(state))
+        food = api.foodSet(state)
         legal = api.legalActions(state)
         
         #Run value iteration and update the map
@@ -0,0 +1,138 @@
+# numericGrid.py
+#
+# A grid of numbers for the utility maps of the agents in mapAgents.py
+# and mdpAgents.py.
+#
+# These work with the PacMan AI projects from:
+#
+# http://ai.berkeley.edu/
+#
+# As required by the licensing agreement for the PacMan AI we have:
+#
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+from array import array
+
+# numpy is optional, and only needed for view().
+try:
+    import numpy
+    _NUMPY_ENABLED = True
+except ImportError:
+    _NUMPY_ENABLED = False
+
+#
+# A drop in replacement for the Grid class the agents started with,
+# for grids that only hold numbers.
+#
+# Rather than a list of rows of python objects, the values are kept in
+# one flat array of doubles, a row at a time: (x, y) is at index
+# y * width + x, just as it was at grid[y][x]. That takes a fraction
+# of the memory, and lets whole grids be filled, copied and compared
+# without going through getValue and setValue for every square.
+#
+class NumericGrid:
+
+    # Constructor
+    #
+    # Note that it creates variables:
+    #
+    # values: an array('d') that has one position for each element in the grid.
+    # width:  the width of the grid
+    # height: the height of the grid
+    def __init__(self, width, height, value=0):
+        self.width = width
+        self.height = height
+        self.values = array('d', [value]) * (width * height)
+
+    # Print the grid out. Whole numbers are printed without the .0, as
+    # they were when the grid held ints.
+    def display(self):
+        for i in range(self.height):
+            for j in range(self.width):
+                # print grid elements with no newline
+                print self.format(self.values[i * self.width + j]),
+            # A new line after each line of the grid
+            print
+        # A line after the grid
+        print
+
+    # The display function prints the grid out upside down. This
+    # prints the grid out so that it matches the view we see when we
+    # look at Pacman.
+    def prettyDisplay(self):
+        for i in range(self.height):
+            for j in range(self.width):
+                # print grid elements with no newline
+                print self.format(self.values[(self.height - (i + 1)) * self.width + j]),
+            # A new line after each line of the grid
+            print
+        # A line after the grid
+        print
+
+    # How display and prettyDisplay print a value.
+    def format(self, value):
+        if value.is_integer():
+            return int(value)
+        return value
+
+    # Where (x, y) is in values.
+    def index(self, x, y):
+        return y * self.width + x
+
+    # Set and get the values of specific elements in the grid.
+    # Here x and y are indices.
+    def setValue(self, x, y, value):
+        self.values[y * self.width + x] = value
+
+    def getValue(self, x, y):
+        return self.values[y * self.width + x]
+
+    # Return width and height to support functions that manipulate the
+    # values stored in the grid.
+    def getHeight(self):
+        return self.height
+
+    def getWidth(self):
+        return self.width
+
+    # Set every element to value.
+    def fill(self, value):
+        self.values[:] = array('d', [value]) * (self.width * self.height)
+
+    # A new grid with the same values.
+    def copy(self):
+        grid = NumericGrid(self.width, self.height)
+        grid.values = array('d', self.values)
+        return grid
+
+    # Overwrite this grid with the values of another of the same size.
+    def copyFrom(self, other):
+        if other.width != self.width or other.height != self.height:
+            raise Exception('Can only copy a %dx%d grid' % (self.width, self.height))
+        self.values[:] = other.values
+
+    # The largest difference between an element of this grid and the
+    # same element of another of the same size.
+    def diff(self, other):
+        if other.width != self.width or other.height != self.height:
+            raise Exception('Can only compare with a %dx%d grid' % (self.width, self.height))
+        if len(self.values) == 0:
+            return 0.0
+        return max([abs(a - b) for (a, b) in zip(self.values, other.values)])
+
+    # A numpy array of shape (height, width) that shares its memory with
+    # the grid, so view()[y, x] is the value at (x, y), and writing to
+    # the view changes the grid.
+    def view(self):
+        if not _NUMPY_ENABLED:
+            raise Exception('NumericGrid.view needs numpy installed')
+        return numpy.frombuffer(self.values, dtype=float).reshape(self.height, self.width)
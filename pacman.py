@@ -43,9 +43,11 @@ from game import GameStateData
 from game import Game
 from game import Directions
 from game import Actions
+from game import Configuration
+from game import GameTimings
 from util import nearestPoint
 from util import manhattanDistance
-import util, layout
+import util, layout, recording
 import sys, types, time, random, os
 
 ###################################################
@@ -112,7 +114,7 @@ class GameState:
         if agentIndex == 0:
             state.data.scoreChange += -TIME_PENALTY # Penalty for waiting around
         else:
-            GhostRules.decrementTimer( state.data.agentStates[agentIndex] )
+            GhostRules.decrementTimer( state.data.getAgentStateForUpdate( agentIndex ) )
 
         # Resolve multi-agent effects
         GhostRules.checkDeath( state, agentIndex )
@@ -201,7 +203,7 @@ class GameState:
         return self.data.layout.walls
 
     def hasFood(self, x, y):
-        return self.data.food[x][y]
+        return self.data.food.get(x, y)
 
     def hasWall(self, x, y):
         return self.data.layout.walls[x][y]
@@ -342,7 +344,7 @@ class PacmanRules:
         if action not in legal:
             raise Exception("Illegal action " + str(action))
 
-        pacmanState = state.data.agentStates[0]
+        pacmanState = state.data.getAgentStateForUpdate( 0 )
 
         # Update Configuration
         vector = Actions.directionToVector( action, PacmanRules.PACMAN_SPEED )
@@ -359,10 +361,10 @@ class PacmanRules:
     def consume( position, state ):
         x,y = position
         # Eat food
-        if state.data.food[x][y]:
+        if state.data.food.get(x, y):
             state.data.scoreChange += 10
             state.data.food = state.data.food.copy()
-            state.data.food[x][y] = False
+            state.data.food.set(x, y, False)
             state.data._foodEaten = position
             # TODO: cache numFood?
             numFood = state.getNumFood()
@@ -371,11 +373,11 @@ class PacmanRules:
                 state.data._win = True
         # Eat capsule
         if( position in state.getCapsules() ):
-            state.data.capsules.remove( position )
+            state.data.capsules = [capsule for capsule in state.data.capsules if capsule != position]
             state.data._capsuleEaten = position
             # Reset all ghosts' scared timers
             for index in range( 1, len( state.data.agentStates ) ):
-                state.data.agentStates[index].scaredTimer = SCARED_TIME
+                state.data.getAgentStateForUpdate( index ).scaredTimer = SCARED_TIME
     consume = staticmethod( consume )
 
 class GhostRules:
@@ -404,7 +406,7 @@ class GhostRules:
         if action not in legal:
             raise Exception("Illegal ghost action " + str(action))
 
-        ghostState = state.data.agentStates[ghostIndex]
+        ghostState = state.data.getAgentStateForUpdate( ghostIndex )
         speed = GhostRules.GHOST_SPEED
         if ghostState.scaredTimer > 0: speed /= 2.0
         vector = Actions.directionToVector( action, speed )
@@ -413,24 +415,24 @@ class GhostRules:
 
     def decrementTimer( ghostState):
         timer = ghostState.scaredTimer
+        if timer == 0: return
         if timer == 1:
-            ghostState.configuration.pos = nearestPoint( ghostState.configuration.pos )
-        ghostState.scaredTimer = max( 0, timer - 1 )
+            # Configurations are shared between states, so swap in a new one
+            ghostState.configuration = Configuration( nearestPoint( ghostState.configuration.pos ), ghostState.configuration.direction )
+        ghostState.scaredTimer = timer - 1
     decrementTimer = staticmethod( decrementTimer )
 
     def checkDeath( state, agentIndex):
         pacmanPosition = state.getPacmanPosition()
         if agentIndex == 0: # Pacman just moved; Anyone can kill him
             for index in range( 1, len( state.data.agentStates ) ):
-                ghostState = state.data.agentStates[index]
-                ghostPosition = ghostState.configuration.getPosition()
+                ghostPosition = state.data.agentStates[index].configuration.getPosition()
                 if GhostRules.canKill( pacmanPosition, ghostPosition ):
-                    GhostRules.collide( state, ghostState, index )
+                    GhostRules.collide( state, state.data.getAgentStateForUpdate( index ), index )
         else:
-            ghostState = state.data.agentStates[agentIndex]
-            ghostPosition = ghostState.configuration.getPosition()
+            ghostPosition = state.data.agentStates[agentIndex].configuration.getPosition()
             if GhostRules.canKill( pacmanPosition, ghostPosition ):
-                GhostRules.collide( state, ghostState, agentIndex )
+                GhostRules.collide( state, state.data.getAgentStateForUpdate( agentIndex ), agentIndex )
     checkDeath = staticmethod( checkDeath )
 
     def collide( state, ghostState, agentIndex):
@@ -439,6 +441,7 @@ class GhostRules:
             GhostRules.placeGhost(state, ghostState)
             ghostState.scaredTimer = 0
             # Added for first-person
+            state.data._eaten = state.data._eaten[:]
             state.data._eaten[agentIndex] = True
         else:
             if not state.data._win:
@@ -511,8 +514,20 @@ def readCommand( argv ):
                       help='Fixes the random seed to always play the same game', default=False)
     parser.add_option('-r', '--recordActions', action='store_true', dest='record',
                       help='Writes game histories to a file (named by the time they were played)', default=False)
+    parser.add_option('--recordFile', dest='recordFile', metavar='FILE',
+                      help='Append game histories to FILE, even if it already holds games (implies -r)', default=None)
+    parser.add_option('--timings', action='store_true', dest='timings',
+                      help='Print latency percentiles for each agent and phase of a turn over all the games', default=False)
+    parser.add_option('--profile', dest='profile', metavar='FILE',
+                      help='Run the games under cProfile, save the stats to FILE (a .pstats file) and print the hot spots in each module', default=None)
+    parser.add_option('--profileTop', dest='profileTop', type='int', metavar='N',
+                      help=default('How many functions to show per module with --profile'), default=10)
     parser.add_option('--replay', dest='gameToReplay',
-                      help='A recorded game file (pickle) to replay', default=None)
+                      help='A file of recorded games (or an old pickled game) to replay; with -q the games are re-simulated without display and their scores checked', default=None)
+    parser.add_option('--replay-from', dest='replayFrom', type='int', metavar='MOVE',
+                      help=default('Skip straight to MOVE when replaying'), default=0)
+    parser.add_option('--replay-to', dest='replayTo', type='int', metavar='MOVE',
+                      help='Stop replaying after MOVE', default=None)
     parser.add_option('-a','--agentArgs',dest='agentArgs',
                       help='Comma separated values sent to agent. e.g. "opt1=val1,opt2,opt3=val3"')
     parser.add_option('-x', '--numTraining', dest='numTraining', type='int',
@@ -523,6 +538,14 @@ def readCommand( argv ):
                       help='Turns on exception handling and timeouts during games', default=False)
     parser.add_option('--timeout', dest='timeout', type='int',
                       help=default('Maximum length of time an agent can spend computing in a single game'), default=30)
+    parser.add_option('--cacheLayouts', action='store_true', dest='cacheLayouts',
+                      help='Save indexes built for a layout next to the layout file, and reuse them in later runs', default=False)
+    parser.add_option('--workers', dest='workers', type='int', metavar='WORKERS',
+                      help='Play the games in parallel in WORKERS processes, each game with its own seed (implies --seedPerGame and -q)', default=None)
+    parser.add_option('--seedPerGame', action='store_true', dest='seedPerGame',
+                      help='Play each game with its own seed, drawn up front, so the games are the same as with --workers', default=False)
+    parser.add_option('--results', dest='results', metavar='FILE',
+                      help='Write a record of each game to FILE as it ends, as CSV if FILE ends in .csv and JSON lines otherwise, and keep no games (implies -q)', default=None)
 
     options, otherjunk = parser.parse_args(argv)
     if len(otherjunk) != 0:
@@ -532,7 +555,15 @@ def readCommand( argv ):
     # Fix the random seed
     if options.fixRandomSeed: random.seed('cs188')
 
+    # Games played in parallel can't share a display, and batch runs don't need one
+    if options.workers != None:
+        if options.workers < 1: raise Exception('--workers needs at least one worker')
+        options.quietGraphics = True
+    if options.results != None:
+        options.quietGraphics = True
+
     # Choose a layout
+    if options.cacheLayouts: layout.PERSIST_CACHES = True
     args['layout'] = layout.getLayout( options.layout )
     if args['layout'] == None: raise Exception("The layout " + options.layout + " cannot be found")
 
@@ -567,19 +598,39 @@ def readCommand( argv ):
         import graphicsDisplay
         args['display'] = graphicsDisplay.PacmanGraphics(options.zoom, frameTime = options.frameTime)
     args['numGames'] = options.numGames
-    args['record'] = options.record
+    args['record'] = options.recordFile or options.record
     args['catchExceptions'] = options.catchExceptions
     args['timeout'] = options.timeout
+    args['workers'] = options.workers
+    args['seedPerGame'] = options.seedPerGame
+    args['results'] = options.results
+    args['timings'] = options.timings
+    if options.profile != None:
+        # Not runGames arguments: the main block takes these out
+        args['profile'] = options.profile
+        args['profileTop'] = options.profileTop
 
     # Special case: recorded games don't use the runGames method or args structure
     if options.gameToReplay != None:
+        if recording.isRecording(options.gameToReplay):
+            for i, record in enumerate(recording.readGames(options.gameToReplay)):
+                replay = ReplayEngine(recording.findLayout(record), record.moves, record.numAgents - 1)
+                if options.quietGraphics:
+                    score = replay.getState(len(replay)).getScore()
+                    print 'Game %d: %s, %d moves, score %s%s' % (i + 1, record.layoutName, len(replay), score,
+                                                                  ['  (recorded %s)' % record.score, ''][score == record.score])
+                    continue
+                print 'Replaying recorded game %d of %s.' % (i + 1, options.gameToReplay)
+                replayGame(replay.layout, record.moves, args['display'], record.numAgents - 1, options.replayFrom, options.replayTo, replay)
+                replay.checkScore(record.score)
+            sys.exit(0)
         print 'Replaying recorded game %s.' % options.gameToReplay
         import cPickle
         f = open(options.gameToReplay)
         try: recorded = cPickle.load(f)
         finally: f.close()
         recorded['display'] = args['display']
-        replayGame(**recorded)
+        replayGame(start=options.replayFrom, end=options.replayTo, **recorded)
         sys.exit(0)
 
     return args
@@ -607,15 +658,73 @@ def loadAgent(pacman, nographics):
                 return getattr(module, pacman)
     raise Exception('The agent ' + pacman + ' is not specified in any *Agents.py.')
 
-def replayGame( layout, actions, display ):
+class ReplayEngine:
+    """
+    Re-simulates a recorded game without a display, so that the state after
+    any number of moves can be had without watching the moves before it.
+
+    A checkpoint of the state is kept every `interval` moves as the game is
+    simulated, so seeking back, or forward again, only replays the moves
+    since the nearest checkpoint.  States share what they don't change
+    (see GameStateData), which keeps the checkpoints small.
+    """
+    def __init__( self, layout, actions, numGhosts=None, interval=100 ):
+        if numGhosts == None: numGhosts = layout.getNumGhosts()
+        self.layout = layout
+        self.actions = list( actions )
+        self.interval = interval
+        start = GameState()
+        start.initialize( layout, numGhosts )
+        self.checkpoints = [start]
+
+    def __len__( self ):
+        return len( self.actions )
+
+    def getState( self, move ):
+        """
+        Returns the state after the given number of moves.
+        """
+        if move < 0 or move > len( self.actions ):
+            raise Exception( 'The game has no move %d; it has %d moves' % (move, len( self.actions )) )
+        index = min( move / self.interval, len( self.checkpoints ) - 1 )
+        state = self.checkpoints[index]
+        for i in range( index * self.interval, move ):
+            if self.actions[i][1] != None:
+                state = state.generateSuccessor( *self.actions[i] )
+            if (i + 1) % self.interval == 0 and (i + 1) / self.interval == len( self.checkpoints ):
+                self.checkpoints.append( state )
+        return state
+
+    def checkScore( self, score ):
+        """
+        Warns if replaying the whole game doesn't end with the given score.
+        """
+        replayed = self.getState( len( self.actions ) ).getScore()
+        if replayed != score:
+            print >>sys.stderr, 'Replayed score %s does not match the recorded score %s' % (replayed, score)
+        return replayed == score
+
+def replayGame( layout, actions, display, numGhosts=None, start=0, end=None, replay=None ):
+    """
+    Shows a recorded game from move `start` up to move `end`, skipping
+    straight to the start without showing the moves before it.  A
+    ReplayEngine for the game can be passed in to reuse its checkpoints.
+    """
     import pacmanAgents, ghostAgents
     rules = ClassicGameRules()
-    agents = [pacmanAgents.GreedyAgent()] + [ghostAgents.RandomGhost(i+1) for i in range(layout.getNumGhosts())]
+    if numGhosts == None: numGhosts = layout.getNumGhosts()
+    if replay == None: replay = ReplayEngine( layout, actions, numGhosts )
+    actions = replay.actions
+    if end == None or end > len( actions ): end = len( actions )
+    start = max( 0, min( start, end ) )
+    agents = [pacmanAgents.GreedyAgent()] + [ghostAgents.RandomGhost(i+1) for i in range(numGhosts)]
     game = rules.newGame( layout, agents[0], agents[1:], display )
-    state = game.state
+    state = replay.getState( start )
     display.initialize(state.data)
 
-    for action in actions:
+    for action in actions[start:end]:
+        # An action the agent crashed on didn't change the state
+        if action[1] == None: continue
             # Execute the action
         state = state.generateSuccessor( *action )
         # Change the display
@@ -625,10 +734,48 @@ def replayGame( layout, actions, display ):
 
     display.finish()
 
-def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0, catchExceptions=False, timeout=30 ):
+def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0, catchExceptions=False, timeout=30, workers=None, seedPerGame=False, results=None, timings=False ):
+    """
+    Plays numGames games and prints a summary of how they went.
+
+    If results names a file, a record of each game is written to it as soon
+    as the game ends (see ResultWriter) and the games are not kept, so any
+    number of games can be played in constant memory.
+
+    If record is a file name, the games are appended to it in the format of
+    recording.py; if it is just True, to a file named by the time.
+
+    The games are played one after another from the random module as it
+    is, recorded or not, so recording doesn't change them.  With workers,
+    or if seedPerGame is True, each game is instead played with its own
+    seed, drawn up front from the random module, so the games don't depend
+    on which of them ran first or where; a recorded game's seed then goes
+    in the recording.
+
+    If timings is True, the timings of each game (see game.GameTimings) are
+    merged and reported at the end.
+    """
     import __main__
     __main__.__dict__['_display'] = display
 
+    sink = None
+    if results != None: sink = ResultWriter( results )
+
+    recorder = None
+    if record:
+        if record == True:
+            record = 'recorded-games-%s.rec' % time.strftime( '%Y%m%d-%H%M%S' )
+        recorder = recording.Recorder( record )
+
+    allTimings = None
+    if timings: allTimings = GameTimings()
+
+    seeds = None
+    if workers != None or seedPerGame:
+        seeds = [random.getrandbits(32) for i in range( numGames )]
+    if workers != None:
+        return runGamesInParallel( layout, pacman, ghosts, seeds, recorder, numTraining, catchExceptions, timeout, workers, sink, allTimings )
+
     rules = ClassicGameRules(timeout)
     games = []
 
@@ -642,29 +789,234 @@ def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0
         else:
             gameDisplay = display
             rules.quiet = False
+        seed = None
+        if seeds != None:
+            seed = seeds[i]
+            random.seed( seed )
+        start = time.time()
         game = rules.newGame( layout, pacman, ghosts, gameDisplay, beQuiet, catchExceptions)
         game.run()
-        if not beQuiet: games.append(game)
-
-        if record:
-            import time, cPickle
-            fname = ('recorded-game-%d' % (i + 1)) +  '-'.join([str(t) for t in time.localtime()[1:6]])
-            f = file(fname, 'w')
-            components = {'layout': layout, 'actions': game.moveHistory}
-            cPickle.dump(components, f)
-            f.close()
-
-    if (numGames-numTraining) > 0:
-        scores = [game.state.getScore() for game in games]
-        wins = [game.state.isWin() for game in games]
-        winRate = wins.count(True)/ float(len(wins))
-        print 'Average Score:', sum(scores) / float(len(scores))
-        print 'Scores:       ', ', '.join([str(score) for score in scores])
-        print 'Win Rate:      %d/%d (%.2f)' % (wins.count(True), len(wins), winRate)
-        print 'Record:       ', ', '.join([ ['Loss', 'Win'][int(w)] for w in wins])
+        if not beQuiet:
+            if sink != None: sink.write( gameRecord( i, game, time.time() - start ) )
+            else: games.append(game)
+            if allTimings != None: allTimings.merge( game.timings )
+
+        if recorder != None:
+            recorder.write( layout, game.moveHistory, len( game.agents ), game.state.getScore(), game.state.isWin(), seed )
+
+    if sink != None:
+        sink.close()
+        sink.printSummary()
+    elif (numGames-numTraining) > 0:
+        printSummary( games )
+    if allTimings != None:
+        print allTimings.report()
+
+    return games
+
+def printSummary( games ):
+    scores = [game.state.getScore() for game in games]
+    wins = [game.state.isWin() for game in games]
+    winRate = wins.count(True)/ float(len(wins))
+    print 'Average Score:', sum(scores) / float(len(scores))
+    print 'Scores:       ', ', '.join([str(score) for score in scores])
+    print 'Win Rate:      %d/%d (%.2f)' % (wins.count(True), len(wins), winRate)
+    print 'Record:       ', ', '.join([ ['Loss', 'Win'][int(w)] for w in wins])
+
+RESULT_FIELDS = ['game', 'score', 'win', 'moves', 'agentTimes', 'crashed', 'timedOut', 'time']
 
+def gameRecord( index, game, elapsed ):
+    """
+    The compact record of a finished game that ResultWriter writes, with a
+    value for each of RESULT_FIELDS.
+    """
+    return [index, game.state.getScore(), game.state.isWin(), len( game.moveHistory ),
+            [round( t, 6 ) for t in game.totalAgentTimes], game.agentCrashed, game.agentTimeout, round( elapsed, 6 )]
+
+class ResultWriter:
+    """
+    Streams game records (see gameRecord) to a file, one line per game,
+    flushed as each game ends.  Files whose names end in .csv get CSV with
+    a header row, and the agent times separated by spaces; anything else
+    gets JSON lines.  Only running totals are kept for the summary.
+    """
+    def __init__( self, filename ):
+        self.csv = filename.endswith( '.csv' )
+        if self.csv:
+            import csv
+            self.file = open( filename, 'wb' )
+            self.writer = csv.writer( self.file )
+            self.writer.writerow( RESULT_FIELDS )
+        else:
+            self.file = open( filename, 'w' )
+        self.games = 0
+        self.wins = 0
+        self.totalScore = 0.0
+
+    def write( self, record ):
+        if self.csv:
+            row = record[:]
+            row[RESULT_FIELDS.index( 'agentTimes' )] = ' '.join( [str( t ) for t in row[RESULT_FIELDS.index( 'agentTimes' )]] )
+            self.writer.writerow( row )
+        else:
+            import json
+            from collections import OrderedDict
+            self.file.write( json.dumps( OrderedDict( zip( RESULT_FIELDS, record ) ) ) + '\n' )
+        self.file.flush()
+        self.games += 1
+        self.totalScore += record[1]
+        if record[2]: self.wins += 1
+
+    def close( self ):
+        self.file.close()
+
+    def printSummary( self ):
+        if self.games == 0: return
+        print 'Average Score:', self.totalScore / self.games
+        print 'Win Rate:      %d/%d (%.2f)' % (self.wins, self.games, self.wins / float( self.games ))
+
+def runGamesInParallel( layout, pacman, ghosts, seeds, recorder, numTraining, catchExceptions, timeout, workers, sink=None, allTimings=None ):
+    """
+    Plays the games of runGames in a pool of worker processes, quietly.
+
+    Game i is played with seeds[i], the seed runGames plays it with too
+    given seedPerGame, so with -f the results are the same whatever the
+    number of workers, and the same as without workers but with
+    --seedPerGame.  Games are handed out one at a time.
+    Their records go to the sink as they come in; without one, the Game
+    objects runGames returns are rebuilt in game order, with their final
+    states and move histories.
+    """
+    import multiprocessing, textDisplay
+    indices = range( numTraining, len( seeds ) )
+    if len( indices ) == 0: return []
+    workers = min( workers, len( indices ) )
+
+    rules = ClassicGameRules(timeout)
+    games = []
+    gameTime = 0.0
+    start = time.time()
+    pool = multiprocessing.Pool( workers, startWorker, (layout, pacman, ghosts, numTraining, catchExceptions, timeout, seeds) )
+    try:
+        for result, state, moveHistory, gameTimings in pool.imap_unordered( playWorkerGame, indices ):
+            i = result[0]
+            gameTime += result[-1]
+            if allTimings != None:
+                allTimings.merge( gameTimings )
+            if recorder != None:
+                recorder.write( layout, moveHistory, state.getNumAgents(), result[1], result[2], seeds[i] )
+            if sink != None:
+                sink.write( result )
+                continue
+            game = rules.newGame( layout, pacman, ghosts, textDisplay.NullGraphics(), True, catchExceptions )
+            game.state = state
+            game.moveHistory = moveHistory
+            game.totalAgentTimes = result[4]
+            game.agentCrashed = result[5]
+            game.agentTimeout = result[6]
+            game.timings = gameTimings
+            game.gameOver = True
+            games.append( (i, game) )
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.close()
+        pool.join()
+    elapsed = time.time() - start
+
+    games = [game for i, game in sorted( games )]
+    if sink != None:
+        sink.close()
+        sink.printSummary()
+    else:
+        printSummary( games )
+    print 'Game Time:     %.2fs for %d games, %.2fs elapsed with %d workers' % (gameTime, len( indices ), elapsed, workers)
+    if allTimings != None:
+        print allTimings.report()
     return games
 
+# The game components of a worker process, set up by startWorker, and the
+# traceback of its training games if they failed
+WORKER = None
+WORKER_ERROR = None
+
+def startWorker( layout, pacman, ghosts, numTraining, catchExceptions, timeout, seeds ):
+    """
+    Sets up a worker process for runGamesInParallel.  The agents are the
+    worker's own copies, so the training games are played here first, in
+    order, to train agents that learn.
+
+    If the pool's initializer raises, Pool just starts another worker in
+    place of the one that died, which fails the same way, forever.  So a
+    failure is kept instead, and raised by every game the worker is given,
+    which stops runGamesInParallel.
+    """
+    import traceback
+    global WORKER, WORKER_ERROR
+    WORKER = (layout, pacman, ghosts, catchExceptions, ClassicGameRules(timeout), seeds)
+    try:
+        for i in range( numTraining ):
+            playWorkerGame( i )
+    except Exception:
+        WORKER_ERROR = traceback.format_exc()
+
+def playWorkerGame( index ):
+    """
+    Plays game number index in a worker process.  Returns its record, final
+    state, move history and timings.
+    """
+    import textDisplay
+    if WORKER_ERROR != None:
+        raise Exception( 'The training games failed in a worker process:\n' + WORKER_ERROR )
+    layout, pacman, ghosts, catchExceptions, rules, seeds = WORKER
+    random.seed( seeds[index] )
+    start = time.time()
+    game = rules.newGame( layout, pacman, ghosts, textDisplay.NullGraphics(), True, catchExceptions )
+    game.run()
+    return gameRecord( index, game, time.time() - start ), game.state, game.moveHistory, game.timings
+
+def runProfiled( args, filename, top=10 ):
+    """
+    Runs runGames( **args ) under cProfile, saves the stats to filename and
+    prints where the time went.  With --workers only this process, not the
+    games in the workers, is profiled.
+    """
+    import cProfile, pstats
+    profiler = cProfile.Profile()
+    profiler.runcall( runGames, **args )
+    profiler.dump_stats( filename )
+    printProfile( pstats.Stats( filename ), top )
+    print 'Profile saved to %s' % filename
+
+def printProfile( stats, top=10 ):
+    """
+    Prints, for each module of the game (mdpAgents, api, game, pacman and
+    so on), the time spent in its own code and its top functions by
+    cumulative time.  Everything outside the game's directory, built-ins
+    included, counts as one module, '(other)'.
+    """
+    here = os.path.dirname( os.path.abspath( __file__ ) )
+    modules = {}
+    for (filename, line, name), (primitiveCalls, calls, selfTime, cumulative, callers) in stats.stats.items():
+        if filename != '~' and os.path.dirname( os.path.abspath( filename ) ) == here:
+            module = os.path.splitext( os.path.basename( filename ) )[0]
+        else:
+            module = '(other)'
+        modules.setdefault( module, [] ).append( (cumulative, selfTime, calls, '%s:%d(%s)' % (os.path.basename( filename ), line, name)) )
+
+    print 'Total time: %.3fs' % stats.total_tt
+    byTime = [(sum( [f[1] for f in functions] ), module) for module, functions in modules.items()]
+    byTime.sort( reverse = True )
+    for moduleTime, module in byTime:
+        print
+        print '%-20s %.3fs in its own code (%.1f%%)' % (module, moduleTime, 100 * moduleTime / max( stats.total_tt, 1e-9 ))
+        print '    %10s %10s %10s  %s' % ('cumulative', 'own', 'calls', 'function')
+        functions = modules[module]
+        functions.sort( reverse = True )
+        for cumulative, selfTime, calls, name in functions[:top]:
+            print '    %10.3f %10.3f %10d  %s' % (cumulative, selfTime, calls, name)
+
 if __name__ == '__main__':
     """
     The main function called when pacman.py is run
@@ -677,8 +1029,9 @@ if __name__ == '__main__':
     > python pacman.py --help
     """
     args = readCommand( sys.argv[1:] ) # Get game components based on input
-    runGames( **args )
-
-    # import cProfile
-    # cProfile.run("runGames( **args )")
+    if 'profile' in args:
+        profile, top = args.pop( 'profile' ), args.pop( 'profileTop' )
+        runProfiled( args, profile, top )
+    else:
+        runGames( **args )
     pass
@@ -0,0 +1,173 @@
+# recording.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+"""
+A compact binary format for recorded games.
+
+A recording file is a sequence of games, each written in one go, so games
+can be appended to a file at any time and read back one by one.  Each game
+is a fixed header followed by the layout name and the moves:
+
+  magic 'PACR', format version           (5 bytes)
+  SHA-1 of the layout text               (20 bytes, see Layout.getHash)
+  random seed the game was played with   (8 bytes, NO_SEED if unknown)
+  number of agents                       (1 byte)
+  number of moves                        (4 bytes)
+  final score, and whether Pacman won    (9 bytes)
+  layout name length, then the name      (1 byte + name)
+  the moves, 3 bits each, little-endian  ((3 * moves + 7) / 8 bytes)
+
+Agents move in turn starting with Pacman, so the agent behind each move is
+implied by its position and only the action is stored.  An agent that
+crashes or times out under --catchExceptions can leave an action that isn't
+a direction, such as None, as the last move; it is stored as UNKNOWN and
+read back as None.  The game ended there without it changing the state, so
+replays skip it.
+"""
+
+import binascii
+import os
+import struct
+
+from game import Directions
+
+MAGIC = 'PACR'
+VERSION = 1
+NO_SEED = 2 ** 64 - 1
+HEADER = struct.Struct('>4sB20sQBIdBB')
+
+# Action codes; each fits in 3 bits
+ACTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST, Directions.STOP]
+CODES = dict([(action, code) for code, action in enumerate(ACTIONS)])
+
+# The code of any other action
+UNKNOWN = 7
+
+class GameRecord:
+    """
+    One recorded game, as read back by readGames.  moves is the move
+    history, as the list of (agentIndex, action) pairs Game.moveHistory
+    holds; seed is None if the game's seed is unknown.
+    """
+    def __init__(self, layoutName, layoutHash, seed, numAgents, moves, score, win):
+        self.layoutName = layoutName
+        self.layoutHash = layoutHash
+        self.seed = seed
+        self.numAgents = numAgents
+        self.moves = moves
+        self.score = score
+        self.win = win
+
+def encodeMoves(moveHistory, numAgents):
+    """
+    Packs the actions of a move history into a string of 3-bit codes.
+    """
+    packed = 0
+    for turn, (agentIndex, action) in enumerate(moveHistory):
+        if agentIndex != turn % numAgents:
+            raise Exception('Agent %d moved out of turn at move %d' % (agentIndex, turn))
+        code = UNKNOWN
+        if isinstance(action, str): code = CODES.get(action, UNKNOWN)
+        packed |= code << (3 * turn)
+    size = (3 * len(moveHistory) + 7) / 8
+    if size == 0: return ''
+    return binascii.unhexlify(('%x' % packed).zfill(2 * size))[::-1]
+
+def decodeMoves(data, numMoves, numAgents):
+    """
+    Unpacks what encodeMoves packed into a list of (agentIndex, action).
+    """
+    if numMoves == 0: return []
+    packed = long(binascii.hexlify(data[::-1]), 16)
+    moves = []
+    for turn in range(numMoves):
+        code = (packed >> (3 * turn)) & 7
+        if code < len(ACTIONS):
+            moves.append((turn % numAgents, ACTIONS[code]))
+        else:
+            moves.append((turn % numAgents, None))
+    return moves
+
+def layoutName(layout):
+    if layout.filename == None: return ''
+    name = os.path.basename(layout.filename)
+    if name.endswith('.lay'): name = name[:-4]
+    return name
+
+class Recorder:
+    """
+    Appends games to a recording file.  The file is only open while a game
+    is written, so several runs can record to the same file.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+
+    def write(self, layout, moveHistory, numAgents, score, win, seed=None):
+        if seed == None: seed = NO_SEED
+        name = layoutName(layout)[:255]
+        header = HEADER.pack(MAGIC, VERSION, binascii.unhexlify(layout.getHash()), seed,
+                             numAgents, len(moveHistory), score, bool(win), len(name))
+        f = open(self.filename, 'ab')
+        try: f.write(header + name + encodeMoves(moveHistory, numAgents))
+        finally: f.close()
+
+def isRecording(filename):
+    """
+    Returns whether filename holds games in this format, rather than an
+    old pickled recording.
+    """
+    f = open(filename, 'rb')
+    try: return f.read(len(MAGIC)) == MAGIC
+    finally: f.close()
+
+def readGames(filename):
+    """
+    Yields a GameRecord for each game in a recording file, reading one game
+    at a time.
+    """
+    f = open(filename, 'rb')
+    try:
+        while True:
+            header = f.read(HEADER.size)
+            if len(header) == 0: return
+            if len(header) < HEADER.size: raise Exception('Recording %s is cut short' % filename)
+            magic, version, digest, seed, numAgents, numMoves, score, win, nameLength = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise Exception('%s is not a recording this version can read' % filename)
+            name = f.read(nameLength)
+            size = (3 * numMoves + 7) / 8
+            data = f.read(size)
+            if len(name) < nameLength or len(data) < size:
+                raise Exception('Recording %s is cut short' % filename)
+            if seed == NO_SEED: seed = None
+            yield GameRecord(name, binascii.hexlify(digest), seed, numAgents,
+                             decodeMoves(data, numMoves, numAgents), score, bool(win))
+    finally:
+        f.close()
+
+def findLayout(record):
+    """
+    Returns the layout a game was recorded on: the layout of the recorded
+    name if its text hasn't changed, and otherwise whichever layout in the
+    layouts directory has the recorded hash.
+    """
+    import layout
+    if record.layoutName:
+        found = layout.getLayout(record.layoutName)
+        if found != None and found.getHash() == record.layoutHash: return found
+    if os.path.isdir('layouts'):
+        for name in sorted(os.listdir('layouts')):
+            if not name.endswith('.lay'): continue
+            found = layout.getLayout(name)
+            if found != None and found.getHash() == record.layoutHash: return found
+    raise Exception('No layout matches the recorded layout %s (%s)' % (record.layoutName, record.layoutHash))
@@ -0,0 +1,73 @@
+# test_anytime.py
+# ---------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+"""
+Tests for MDPAgent's anytime mode.
+"""
+
+import random
+import sys
+import unittest
+from StringIO import StringIO
+
+import layout
+import pacman
+import valueIteration
+from mdpAgents import MDPAgent
+
+class AnytimeTest(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(1)
+        self.stdout = sys.stdout
+        sys.stdout = StringIO()
+        self.anytimeSweeps = MDPAgent.ANYTIME_SWEEPS
+
+    def tearDown(self):
+        MDPAgent.ANYTIME_SWEEPS = self.anytimeSweeps
+        sys.stdout = self.stdout
+
+    def firstMove(self, agent):
+        state = pacman.GameState()
+        state.initialize(layout.getLayout('mediumClassic'), 2)
+        agent.registerInitialState(state)
+        agent.getAction(state)
+        return agent.moveStats[0]
+
+    def testOffByDefault(self):
+        agent = MDPAgent()
+        self.assertEqual(agent.getDeadline(), None)
+        self.assertEqual(self.firstMove(agent), (50, 0.0, False))
+
+    def testSweepsUntilSettled(self):
+        agent = MDPAgent(anytime='True')
+        self.assertEqual(agent.getBudget(), MDPAgent.ANYTIME * MDPAgent.MOVE_WARNING_TIME)
+        sweeps, residual, timedOut = self.firstMove(agent)
+        self.assertEqual((residual, timedOut), (0.0, False))
+
+    def testNotCappedAtTheUsualSweeps(self):
+        """
+        Sweeps carry on past the usual 50 while there is time left and the
+        map hasn't converged.
+        """
+        MDPAgent.ANYTIME_SWEEPS = 200
+        engines = ['python']
+        if valueIteration._NUMPY_ENABLED:
+            engines.append('numpy')
+        for engine in engines:
+            agent = MDPAgent(engine=engine, anytime='1', epsilon='-1')
+            sweeps, residual, timedOut = self.firstMove(agent)
+            self.assertEqual((sweeps, timedOut), (200, False))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+# test_backgroundWorker.py
+# ------------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+"""
+Tests for valueIteration.BackgroundWorker.
+"""
+
+import random
+import sys
+import time
+import unittest
+from StringIO import StringIO
+
+import layout
+import pacman
+import valueIteration
+from mapAgents import MapAgent
+from mdpAgents import MDPAgent
+
+class BackgroundWorkerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+
+    def sweep(self, food, ghosts):
+        """
+        A sweep that never converges, like MapAgent's without a discount.
+        """
+        self.calls.append(food)
+        return 20.0
+
+    def waitForCalls(self, count, timeout=5):
+        end = time.time() + timeout
+        while len(self.calls) < count and time.time() < end:
+            time.sleep(0.01)
+
+    def testLimitWithoutConvergence(self):
+        worker = valueIteration.BackgroundWorker(self.sweep, 'first', [], 1e-6, 5)
+        worker.start()
+        try:
+            self.waitForCalls(5)
+            time.sleep(0.3)
+            self.assertEqual(self.calls, ['first'] * 5)
+
+            worker.pause()
+            self.assertEqual(worker.update('second', []), (5, 20.0))
+            worker.resume()
+            self.waitForCalls(10)
+            time.sleep(0.3)
+            self.assertEqual(self.calls, ['first'] * 5 + ['second'] * 5)
+        finally:
+            worker.stop()
+
+class LeftoverWorkerTest(unittest.TestCase):
+    """
+    A game that ends without final(), as a crashed or timed out one does,
+    leaves the agent's worker running. The next game stops it before the
+    map it sweeps is replaced.
+    """
+
+    def setUp(self):
+        random.seed(1)
+        self.stdout = sys.stdout
+        sys.stdout = StringIO()
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+
+    def assertStoppedFirst(self, agent):
+        state = pacman.GameState()
+        state.initialize(layout.getLayout('smallGrid'), 1)
+        agent.registerInitialState(state)
+        leftover = agent.worker
+        self.assertTrue(leftover.thread.isAlive())
+
+        seen = []
+        makeMap = agent.makeMap
+        def watch(state):
+            seen.append((agent.worker, leftover.thread.isAlive()))
+            makeMap(state)
+        agent.makeMap = watch
+        try:
+            agent.registerInitialState(state)
+        finally:
+            agent.stopWorker()
+        self.assertEqual(seen, [(None, False)])
+
+    def testMDPAgent(self):
+        self.assertStoppedFirst(MDPAgent(background=True))
+
+    def testMapAgent(self):
+        self.assertStoppedFirst(MapAgent(background=True))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+# test_mazeDistances.py
+# ---------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+"""
+Tests for mazeDistances.MazeDistances.
+"""
+
+import unittest
+
+import layout
+
+class MazeDistancesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.layout = layout.getLayout('mediumClassic')
+        self.distances = self.layout.getMazeDistances()
+
+    def testDistances(self):
+        self.assertEqual(self.distances.getDistance((1, 1), (1, 1)), 0)
+        self.assertEqual(self.distances.getDistance((1, 1), (1, 2)), 1)
+        self.assertEqual(self.distances.getDistance((1, 1), (1, 1.5)), 0.5)
+        self.assertEqual(self.distances.getDistance((1, 1.5), (1, 1)), 0.5)
+
+    def testWallsAndOffTheMap(self):
+        """
+        Either end on a wall or off the map is an error, not an infinite
+        distance.
+        """
+        wall = (0, 0)
+        self.assertTrue(self.layout.isWall(wall))
+        for bad in [wall, (-5, 3), (self.layout.width + 2, 1), (0, 0.5)]:
+            self.assertRaises(KeyError, self.distances.getDistance, bad, (1, 1))
+            self.assertRaises(KeyError, self.distances.getDistance, (1, 1), bad)
+
+if __name__ == '__main__':
+    unittest.main()
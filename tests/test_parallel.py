@@ -0,0 +1,77 @@
+# test_parallel.py
+# ----------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+"""
+Tests for playing games in worker processes with --workers.
+"""
+
+import random
+import signal
+import sys
+import unittest
+from StringIO import StringIO
+
+import layout
+import pacman
+import textDisplay
+from game import Agent
+from ghostAgents import RandomGhost
+from pacmanAgents import GreedyAgent
+
+class BrokenAgent(Agent):
+    def getAction(self, state):
+        raise ValueError('broken agent')
+
+def timeUp(signum, frame):
+    raise Exception('Gave up waiting for the games')
+
+class ParallelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.stdout = sys.stdout
+        sys.stdout = StringIO()
+        signal.signal(signal.SIGALRM, timeUp)
+        signal.alarm(120)
+
+    def tearDown(self):
+        signal.alarm(0)
+        sys.stdout = self.stdout
+
+    def play(self, pacmanAgent, numGames, numTraining=0, workers=None, seedPerGame=False):
+        random.seed('cs188')
+        lay = layout.getLayout('smallClassic')
+        ghosts = [RandomGhost(i + 1) for i in range(lay.getNumGhosts())]
+        games = pacman.runGames(lay, pacmanAgent, ghosts, textDisplay.NullGraphics(), numGames, False,
+                                numTraining, workers=workers, seedPerGame=seedPerGame)
+        return [(game.state.getScore(), game.moveHistory) for game in games]
+
+    def testWorkersPlayTheSerialGames(self):
+        serial = self.play(GreedyAgent(), 4, 1, seedPerGame=True)
+        self.assertNotEqual(self.play(GreedyAgent(), 4, 1), serial)
+        self.assertEqual(self.play(GreedyAgent(), 4, 1, workers=1), serial)
+        self.assertEqual(self.play(GreedyAgent(), 4, 1, workers=2), serial)
+
+    def testTrainingFailureIsReported(self):
+        """
+        A training game that fails in a worker stops the run rather than
+        having the pool start new workers forever.
+        """
+        try:
+            self.play(BrokenAgent(), 2, 1, workers=1)
+        except Exception, e:
+            self.assertTrue('broken agent' in str(e), str(e))
+        else:
+            self.fail('The broken agent played its games')
+
+if __name__ == '__main__':
+    unittest.main()
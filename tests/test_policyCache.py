@@ -0,0 +1,92 @@
+# test_policyCache.py
+# -------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+"""
+Tests for MDPAgent's policy cache.
+"""
+
+import random
+import sys
+import unittest
+from StringIO import StringIO
+
+import layout
+import pacman
+from mdpAgents import MDPAgent
+
+class PolicyCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(1)
+        self.stdout = sys.stdout
+        sys.stdout = StringIO()
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+
+    def initialState(self):
+        state = pacman.GameState()
+        state.initialize(layout.getLayout('mediumClassic'), 2)
+        return state
+
+    def testHitWhenRewardsComeBack(self):
+        """
+        A move is used again when Pacman is back on a square with the same
+        rewards, even if other rewards came in between.
+        """
+        state = self.initialState()
+        agent = MDPAgent(policyCache=100)
+        agent.registerInitialState(state)
+        cache = agent.policyCache
+
+        agent.getAction(state)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+        # The same square with a pellet gone has other rewards
+        eaten = state.deepCopy()
+        x, y = state.getFood().asList()[0]
+        eaten.data.food = eaten.data.food.copy()
+        eaten.data.food.set(x, y, False)
+        agent.getAction(eaten)
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+        # Back to the first rewards, whose move is still in the cache
+        agent.getAction(state)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        self.assertEqual(len(cache), 2)
+
+    def testLeastRecentlyUsedMakeWay(self):
+        """
+        A full cache evicts the least recently used move rather than
+        being emptied.
+        """
+        state = self.initialState()
+        agent = MDPAgent(policyCache=1)
+        agent.registerInitialState(state)
+        cache = agent.policyCache
+
+        agent.getAction(state)
+        eaten = state.deepCopy()
+        x, y = state.getFood().asList()[0]
+        eaten.data.food = eaten.data.food.copy()
+        eaten.data.food.set(x, y, False)
+        agent.getAction(eaten)
+        agent.getAction(eaten)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 2, 1))
+
+        # The first move made way for the second
+        agent.getAction(state)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 3, 1))
+
+if __name__ == '__main__':
+    unittest.main()
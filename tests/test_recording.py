@@ -0,0 +1,79 @@
+# test_recording.py
+# -----------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+"""
+Tests for recorded games.
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+from StringIO import StringIO
+
+import layout
+import pacman
+import recording
+import textDisplay
+from game import Directions
+from ghostAgents import RandomGhost
+from pacmanAgents import GreedyAgent
+
+class RecordingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.stdout = sys.stdout
+        sys.stdout = StringIO()
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+        shutil.rmtree(self.directory)
+
+    def play(self, record):
+        random.seed('cs188')
+        lay = layout.getLayout('smallClassic')
+        ghosts = [RandomGhost(i + 1) for i in range(lay.getNumGhosts())]
+        games = pacman.runGames(lay, GreedyAgent(), ghosts, textDisplay.NullGraphics(), 3, record)
+        return [(game.state.getScore(), game.moveHistory) for game in games]
+
+    def testRecordingDoesNotChangeGames(self):
+        filename = os.path.join(self.directory, 'games.rec')
+        played = self.play(filename)
+        self.assertEqual(played, self.play(False))
+        records = list(recording.readGames(filename))
+        self.assertEqual([(record.score, record.moves) for record in records], played)
+        # The games weren't played from seeds of their own
+        self.assertEqual([record.seed for record in records], [None] * 3)
+
+    def testUnknownActions(self):
+        """
+        An action that isn't a direction, as a crashed agent can leave, is
+        recorded as UNKNOWN and skipped on replay.
+        """
+        moves = [(0, Directions.WEST), (1, Directions.EAST), (0, None), (1, 'Sideways')]
+        data = recording.encodeMoves(moves, 2)
+        self.assertEqual(recording.decodeMoves(data, 4, 2),
+                         [(0, Directions.WEST), (1, Directions.EAST), (0, None), (1, None)])
+
+        lay = layout.getLayout('smallClassic')
+        filename = os.path.join(self.directory, 'crash.rec')
+        recording.Recorder(filename).write(lay, moves[:3], 2, -1.0, False, 1)
+        record = list(recording.readGames(filename))[0]
+        replay = pacman.ReplayEngine(lay, record.moves, 1)
+        self.assertEqual(replay.getState(3), replay.getState(2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+# test_suite.py
+# -------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+"""
+A smoke test of the benchmark suite with each of the value iteration
+agents.  Run from the top-level directory, like the suite itself.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from StringIO import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+import suite
+
+class SuiteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.stdout = sys.stdout
+        sys.stdout = StringIO()
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+        shutil.rmtree(self.directory)
+
+    def runSuite(self, agent):
+        output = os.path.join(self.directory, agent + '.json')
+        suite.main(['-l', 'smallGrid', '-p', agent, '-o', output, '-r', '1', '--steps', '20',
+                    '--samples', '5', '--sweeps', '2', '--maxMoves', '10', '--maxGameTime', '5'])
+        f = open(output)
+        try: return json.load(f)['results']['smallGrid']
+        finally: f.close()
+
+    def assertMeasuresEverything(self, agent):
+        results = self.runSuite(agent)
+        self.assertEqual([key for key in results if key.endswith('_error')], [])
+        for key in suite.LOWER_IS_BETTER + suite.HIGHER_IS_BETTER:
+            self.assertTrue(key in results, key)
+
+    def testMDPAgent(self):
+        self.assertMeasuresEverything('MDPAgent')
+
+    def testMapAgent(self):
+        self.assertMeasuresEverything('MapAgent')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+# test_util.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+"""
+Tests for util.PriorityQueue.
+"""
+
+import unittest
+
+import util
+
+def popAll(queue):
+    items = []
+    while not queue.isEmpty():
+        items.append(queue.pop())
+    return items
+
+class PriorityQueueTest(unittest.TestCase):
+
+    def testPushKeepsDuplicatesAndUnhashableItems(self):
+        queue = util.PriorityQueue()
+        queue.push([1], 2)
+        queue.push('a', 3)
+        queue.push([1], 1)
+        queue.push('a', 1)
+        self.assertEqual(queue.entries, {})
+        self.assertEqual(popAll(queue), [[1], 'a', [1], 'a'])
+
+    def testUpdate(self):
+        queue = util.PriorityQueue()
+        queue.update('a', 5)
+        queue.update('b', 4)
+        queue.push('c', 6)
+        queue.push([1], 7)
+        queue.update('a', 3)
+        queue.update('b', 9)
+        queue.update('c', 1)
+        queue.update([1], 2)
+        self.assertEqual(sorted(queue.entriesLeft()), [(1, 2, 'c'), (2, 3, [1]), (3, 0, 'a'), (4, 1, 'b')])
+        self.assertEqual(popAll(queue), ['c', [1], 'a', 'b'])
+        self.assertEqual(queue.entries, {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+# test_valueIteration.py
+# ----------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+"""
+Tests that the value iteration engines give the same utilities as
+MDPAgent's own loop.
+"""
+
+import random
+import unittest
+
+import api
+import layout
+import pacman
+import util
+import valueIteration
+from mdpAgents import MDPAgent
+
+class NumpyEngineTest(unittest.TestCase):
+
+    def sweep(self, engine, layoutName, num, epsilon=None, deadline=None):
+        """
+        The sweeps, residual and map an agent with the engine ends up with,
+        starting from the same scrambled map.
+        """
+        state = pacman.GameState()
+        state.initialize(layout.getLayout(layoutName), 4)
+        agent = MDPAgent(engine=engine)
+        util.mutePrint()
+        try:
+            agent.registerInitialState(state)
+            scramble = random.Random(5)
+            for (x, y) in agent.transitions.squares:
+                agent.map.setValue(x, y, scramble.choice([10.0, scramble.uniform(-5, 10)]))
+            result = agent.updateUtilities(api.wallSet(state), api.foodSet(state), api.ghosts(state), num, state,
+                                           epsilon, deadline)
+        finally:
+            util.unmutePrint()
+        return result, agent.map.values.tostring()
+
+    def assertSameAsPython(self, layoutName, num, epsilon=None):
+        self.assertEqual(self.sweep('numpy', layoutName, num, epsilon),
+                         self.sweep('python', layoutName, num, epsilon))
+
+    def testFixedSweeps(self):
+        for layoutName in ['smallGrid', 'mediumClassic', 'originalClassic']:
+            for num in [1, 2, 7, 50]:
+                self.assertSameAsPython(layoutName, num)
+
+    def testConvergence(self):
+        """
+        Stops on the same sweep as the loop, whether or not that is part
+        of the way through a block of pipelined sweeps.
+        """
+        for epsilon in [0.5, 1e-3, 1e-9]:
+            self.assertSameAsPython('mediumClassic', 1000, epsilon)
+
+    def testCoarseClock(self):
+        """
+        A clock that hasn't ticked since the sweeps started, as on Windows
+        where time.time() moves every 15.6ms, doesn't stop the sweeps
+        being timed against a deadline.
+        """
+        class StoppedClock:
+            def time(self):
+                return 1000.0
+        clock = valueIteration.time
+        valueIteration.time = StoppedClock()
+        try:
+            (sweeps, residual, timedOut), values = self.sweep('numpy', 'mediumClassic', 50, None, 1001.0)
+        finally:
+            valueIteration.time = clock
+        self.assertEqual((sweeps, timedOut), (50, False))
+        self.assertEqual(values, self.sweep('python', 'mediumClassic', 50)[1])
+
+class SweepingEngineTest(unittest.TestCase):
+
+    def testQueueIsIndexed(self):
+        """
+        Every square goes on the queue with update, so none of the
+        updates has to scan the heap for a pushed one.
+        """
+        scans = []
+        queue = util.PriorityQueue
+        class WatchedQueue(queue):
+            def update(self, item, priority):
+                if self.pushed > 0:
+                    scans.append(item)
+                queue.update(self, item, priority)
+        util.PriorityQueue = WatchedQueue
+        try:
+            state = pacman.GameState()
+            state.initialize(layout.getLayout('mediumClassic'), 4)
+            agent = MDPAgent(engine='sweeping')
+            util.mutePrint()
+            try:
+                agent.registerInitialState(state)
+            finally:
+                util.unmutePrint()
+        finally:
+            util.PriorityQueue = queue
+        self.assertEqual(scans, [])
+
+if not valueIteration._NUMPY_ENABLED:
+    NumpyEngineTest = unittest.skip('numpy is not installed')(NumpyEngineTest)
+
+if __name__ == '__main__':
+    unittest.main()
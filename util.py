@@ -28,7 +28,8 @@
 
 import sys
 import inspect
-import heapq, random
+import heapq, random, math
+import collections
 import cStringIO
 
 
@@ -151,18 +152,18 @@ class Stack:
 class Queue:
     "A container with a first-in-first-out (FIFO) queuing policy."
     def __init__(self):
-        self.list = []
+        self.list = collections.deque()
 
     def push(self,item):
         "Enqueue the 'item' into the queue"
-        self.list.insert(0,item)
+        self.list.append(item)
 
     def pop(self):
         """
           Dequeue the earliest enqueued item still in the queue. This
           operation removes the item from the queue.
         """
-        return self.list.pop()
+        return self.list.popleft()
 
     def isEmpty(self):
         "Returns true if the queue is empty"
@@ -174,37 +175,90 @@ class PriorityQueue:
       has a priority associated with it and the client is usually interested
       in quick retrieval of the lowest-priority item in the queue. This
       data structure allows O(1) access to the lowest-priority item.
+
+      To make update O(log n), the entries it adds are kept in a dictionary,
+      and an entry that update replaces is only marked as removed, and
+      skipped when it reaches the top of the heap.  push doesn't hash its
+      items, so updating an item that was pushed, or that can't be hashed,
+      still means a scan of the heap.
     """
     def  __init__(self):
         self.heap = []
         self.count = 0
+        self.size = 0
+        self.pushed = 0
+        self.entries = {}
+        self.recorded = set()
+        self.removed = set()
 
     def push(self, item, priority):
         entry = (priority, self.count, item)
         heapq.heappush(self.heap, entry)
         self.count += 1
+        self.size += 1
+        self.pushed += 1
 
     def pop(self):
-        (_, _, item) = heapq.heappop(self.heap)
-        return item
+        while True:
+            entry = heapq.heappop(self.heap)
+            if id(entry) in self.removed:
+                self.removed.discard(id(entry))
+                continue
+            if id(entry) in self.recorded:
+                self.recorded.discard(id(entry))
+                del self.entries[entry[2]]
+            else:
+                self.pushed -= 1
+            self.size -= 1
+            return entry[2]
 
     def isEmpty(self):
-        return len(self.heap) == 0
+        return self.size == 0
 
     def update(self, item, priority):
         # If item already in priority queue with higher priority, update its priority and rebuild the heap.
         # If item already in priority queue with equal or lower priority, do nothing.
         # If item not in priority queue, do the same thing as self.push.
-        for index, (p, c, i) in enumerate(self.heap):
-            if i == item:
-                if p <= priority:
+        try:
+            entry = self.entries.get(item)
+            hashable = True
+        except TypeError:
+            entry = None
+            hashable = False
+        if entry is None and self.pushed > 0:
+            for other in self.heap:
+                if other[2] == item and id(other) not in self.removed:
+                    entry = other
                     break
-                del self.heap[index]
-                self.heap.append((priority, c, item))
-                heapq.heapify(self.heap)
-                break
+        if entry is None:
+            if not hashable:
+                self.push(item, priority)
+                return
+            count = self.count
+            self.count += 1
+            self.size += 1
+        elif entry[0] <= priority:
+            return
         else:
-            self.push(item, priority)
+            # The new entry keeps the old count, so ties still go to whichever
+            # item was pushed first
+            count = entry[1]
+            self.removed.add(id(entry))
+            if id(entry) in self.recorded:
+                self.recorded.discard(id(entry))
+            else:
+                self.pushed -= 1
+        entry = (priority, count, item)
+        heapq.heappush(self.heap, entry)
+        if hashable:
+            self.entries[item] = entry
+            self.recorded.add(id(entry))
+        else:
+            self.pushed += 1
+
+    def entriesLeft(self):
+        "The (priority, count, item) entries still in the queue, in no order"
+        return [entry for entry in self.heap if id(entry) not in self.removed]
 
 class PriorityQueueWithFunction(PriorityQueue):
     """
@@ -642,7 +696,99 @@ class TimeoutFunction:
                 self.handle_timeout(None, None)
         return result
 
+class LatencyHistogram:
+    """
+    A histogram of durations, in seconds.  Bucket edges grow by a factor of
+    2 ** (1 / BUCKETS_PER_DOUBLING), about 9%, so percentiles are that
+    accurate at any scale, and adding a sample costs a logarithm and a
+    dictionary update.
+    """
+    BUCKETS_PER_DOUBLING = 8
+    SMALLEST = 1e-7
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        if seconds <= self.SMALLEST:
+            bucket = 0
+        else:
+            bucket = int(math.log(seconds / self.SMALLEST, 2) * self.BUCKETS_PER_DOUBLING) + 1
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max: self.max = seconds
+
+    def merge(self, other):
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def mean(self):
+        if self.count == 0: return 0.0
+        return self.total / self.count
 
+    def percentile(self, p):
+        """
+        Returns the duration p percent of the samples are no longer than, to
+        within a bucket: the top edge of the bucket holding that sample,
+        or the longest sample if that is shorter.
+        """
+        if self.count == 0: return 0.0
+        rank = max(1, int(math.ceil(self.count * p / 100.0)))
+        seen = 0
+        for bucket in sorted(self.buckets.keys()):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.max, self.SMALLEST * 2 ** (float(bucket) / self.BUCKETS_PER_DOUBLING))
+        return self.max
+
+class LRUCache:
+    """
+    A dictionary that holds at most capacity entries, dropping the least
+    recently used one to make room.  It counts how many lookups found
+    what they were looking for.
+    """
+    def __init__(self, capacity):
+        if capacity < 1: raise Exception('An LRUCache needs room for at least one entry')
+        self.capacity = capacity
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        "Returns the value for key, or default if it isn't in the cache"
+        if key not in self.entries:
+            self.misses += 1
+            return default
+        self.hits += 1
+        value = self.entries.pop(key)
+        self.entries[key] = value
+        return value
+
+    def put(self, key, value):
+        if key in self.entries:
+            del self.entries[key]
+        elif len(self.entries) >= self.capacity:
+            self.entries.popitem(last=False)
+        self.entries[key] = value
+
+    def clear(self):
+        "Empties the cache, but keeps the counts"
+        self.entries.clear()
+
+    def hitRate(self):
+        lookups = self.hits + self.misses
+        if lookups == 0: return 0.0
+        return self.hits / float(lookups)
+
+    def __len__(self):
+        return len(self.entries)
 
 _ORIGINAL_STDOUT = None
 _ORIGINAL_STDERR = None
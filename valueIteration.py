@@ -0,0 +1,570 @@
+# valueIteration.py
+#
+# Value iteration engines for the MDP agents in mdpAgents.py.
+#
+# These work with the PacMan AI projects from:
+#
+# http://ai.berkeley.edu/
+#
+# As required by the licensing agreement for the PacMan AI we have:
+#
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+import bisect
+import threading
+import time
+import util
+from array import array
+
+# numpy is optional. Engines that need it complain when they are
+# created, so the plain python agents keep working without it.
+try:
+    import numpy
+    _NUMPY_ENABLED = True
+except ImportError:
+    _NUMPY_ENABLED = False
+
+#
+# Squares next to a ghost are as deadly as the ghost itself, diagonals
+# included, since the ghost will be in one of them next. When food is
+# low only the ghost square and the four adjacent ones count, so Pacman
+# can still finish off the last pellets.
+#
+# The squares around a ghost that are dangerous are given as a kernel,
+# a list of offsets from the ghost: all eight neighbours, the four it
+# can step to next, or just its own square.
+#
+AROUND = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+ADJACENT = [(0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)]
+ON = [(0, 0)]
+
+# Scared ghosts that will stay scared for more than this many moves are
+# no danger (see dangerousGhosts).
+SCARED_MARGIN = 2
+
+# The kernel MDPAgent uses for the amount of food left.
+def dangerKernel(food):
+    if len(food) > 2:
+        return AROUND
+    return ADJACENT
+
+# Returns the set of (x, y) squares that get the ghost penalty: the
+# ghosts' squares dilated by the kernel, by default the one from
+# dangerKernel. A ghost between squares (moving slowly when scared)
+# matches no square.
+def dangerSquares(food, ghosts, kernel=None):
+    if kernel == None:
+        kernel = dangerKernel(food)
+    danger = set()
+    for (gx, gy) in ghosts:
+        if gx != int(gx) or gy != int(gy):
+            continue
+        for (dx, dy) in kernel:
+            danger.add((int(gx) + dx, int(gy) + dy))
+    return danger
+
+# The ghosts out of ghosts that are a danger: all but those that will
+# stay scared for more than margin moves. ghostTimes is what
+# api.ghostStatesWithTimes() returns.
+def dangerousGhosts(ghosts, ghostTimes, margin=SCARED_MARGIN):
+    timers = {}
+    for (position, timer) in ghostTimes:
+        # Of two ghosts on one square, the least scared one counts
+        timers[position] = min(timer, timers.get(position, timer))
+    return [ghost for ghost in ghosts if timers.get(ghost, 0) <= margin]
+
+#
+# The rewards for one decision.
+#
+# Neither the food nor the ghosts move while value iteration sweeps, so
+# which squares have food and which are dangerous is worked out once,
+# as flags in two arrays indexed like the squares of the transition
+# table, and the sweeps just read them.
+#
+class RewardField:
+
+    # transitions: the transition table for the layout
+    # food:        the food positions
+    # ghosts:      the positions of the ghosts that are a danger
+    # kernel:      the squares around a ghost that are dangerous, by
+    #              default the ones dangerKernel picks
+    def __init__(self, transitions, food, ghosts, kernel=None):
+        index = transitions.index
+        self.food = array('b', [0]) * transitions.size()
+        self.danger = array('b', [0]) * transitions.size()
+        for square in food:
+            if square in index:
+                self.food[index[square]] = 1
+        for square in dangerSquares(food, ghosts, kernel):
+            if square in index:
+                self.danger[index[square]] = 1
+
+#
+# A vectorised version of the Bellman backup in MDPAgent.updateUtilities.
+#
+# The utilities, food and ghost danger are held as numpy arrays, one
+# entry per square of the layout's transition table (see
+# api.Transitions), and moves are evaluated by gathering the utilities
+# of their outcomes with index arrays built from the table.
+#
+# MDPAgent.updateUtilities updates the map in place, column by column,
+# so when (x, y) is backed up its west and south neighbours already
+# hold this sweep's value while its north and east neighbours still
+# hold the previous one. Every square on the anti-diagonal x + y = d
+# only depends on the diagonals d - 1 and d + 1, so sweeping the
+# diagonals in order gives exactly the same numbers as the per-cell
+# loop.
+#
+# Going one diagonal at a time still leaves a python loop over every
+# diagonal on every sweep. Instead the sweeps are pipelined: sweep s
+# backs up diagonal d at step d + 2s. By then sweep s has done d - 1
+# (at the step before) and sweep s - 1 has done d + 1 (also at the
+# step before) but not yet gone on to d. Each step backs up every
+# other diagonal, each for a different sweep, and no two of them are
+# next to each other, so a step is a single array operation. n sweeps
+# over D diagonals take 2n + D steps rather than nD.
+#
+# Squares are grouped by the parity of their diagonal, and ordered by
+# diagonal, so the diagonals a step backs up are a slice of one group.
+#
+class NumpyEngine:
+
+    # With epsilon or a deadline, sweeps are run this many at a time,
+    # and the checks made after each lot.
+    BLOCK = 10
+
+    # Constructor
+    #
+    # transitions: the transition table for the layout, from api.transitions()
+    # discount:    the discount factor (MDPAgent calls it gemma)
+    def __init__(self, transitions, discount=0.1):
+        if not _NUMPY_ENABLED:
+            raise Exception('The numpy value iteration engine needs numpy installed')
+        self.transitions = transitions
+        self.discount = discount
+        size = transitions.size()
+
+        # One extra slot at the end is the sentinel that moves into a
+        # wall read their utility from. It holds -inf, so they never
+        # win the max.
+        self.sentinel = size
+        self.utilities = numpy.zeros(size + 1)
+        self.utilities[self.sentinel] = -numpy.inf
+        self.food = numpy.zeros(size, dtype=bool)
+        self.danger = numpy.zeros(size, dtype=bool)
+
+        # Group the squares that get backed up by anti-diagonal. A
+        # square with no open neighbour has no action to take, so there
+        # is nothing to back up.
+        byDiagonal = {}
+        for k, (x, y) in enumerate(transitions.squares):
+            if max(transitions.neighbours[4*k:4*k + 4]) != -1:
+                byDiagonal.setdefault(x + y, []).append(k)
+        self.open = []
+        for d in sorted(byDiagonal.keys()):
+            self.open.extend(byDiagonal[d])
+        self.open = numpy.array(self.open, dtype=int)
+        self.diagonals = 0
+        if byDiagonal:
+            self.diagonals = max(byDiagonal.keys()) + 1
+        self.groups = [self.makeGroup(byDiagonal, parity) for parity in (0, 1)]
+        self.schedules = {}
+
+        # Where each square is in the map's values, worked out from the
+        # first map we are given
+        self.cells = None
+
+    # Precompute everything about the diagonals of one parity that does
+    # not change between sweeps: their squares in order of diagonal,
+    # where each diagonal starts, and for each of the four moves the
+    # squares its three outcomes land on and their probabilities.
+    def makeGroup(self, byDiagonal, parity):
+        table = self.transitions
+        numbers = [d for d in sorted(byDiagonal.keys()) if d % 2 == parity]
+        cells = []
+        starts = []
+        for d in numbers:
+            starts.append(len(cells))
+            cells.extend(byDiagonal[d])
+        cells = numpy.array(cells, dtype=int)
+        neighbours = numpy.array(table.neighbours).reshape(-1, 4)[cells]
+        successors = numpy.array(table.successors).reshape(-1, 4, 3)[cells]
+        probabilities = numpy.array(table.probabilities).reshape(-1, 4, 3)[cells]
+        blocked = (neighbours == -1)[:, :, numpy.newaxis]
+        outcomes = numpy.where(blocked, self.sentinel, successors).transpose(2, 1, 0).copy()
+        return {'numbers': numbers, 'diagonals': numpy.array(numbers, dtype=int),
+                'starts': starts + [len(cells)], 'cells': cells,
+                'outcomes': outcomes, 'probabilities': probabilities.transpose(2, 1, 0).copy(),
+                'food': numpy.zeros(len(cells), dtype=bool), 'base': numpy.zeros(len(cells))}
+
+    # The steps that num pipelined sweeps take. Each is the slice of a
+    # group it backs up, as views of the group's arrays, with where its
+    # diagonals start in the slice and which sweep each one is for.
+    # They only depend on num, so they are worked out once for each.
+    def schedule(self, num):
+        if num in self.schedules:
+            return self.schedules[num]
+        steps = []
+        last = self.diagonals - 1
+        for step in range(last + 2 * num - 1):
+            group = self.groups[step % 2]
+            # The diagonals at this step are those sweeps 0 to num - 1
+            # have got to, d = step - 2s
+            numbers = group['numbers']
+            first = bisect.bisect_left(numbers, step - 2 * (num - 1))
+            end = bisect.bisect_right(numbers, min(step, last))
+            if first >= end:
+                continue
+            a = group['starts'][first]
+            b = group['starts'][end]
+            steps.append((group['cells'][a:b], group['outcomes'][:, :, a:b], group['probabilities'][:, :, a:b],
+                          group['food'][a:b], group['base'][a:b],
+                          numpy.array(group['starts'][first:end]) - a,
+                          (step - group['diagonals'][first:end]) // 2))
+        self.schedules[num] = steps
+        return steps
+
+    # Copy the map into the utility array and work out the rewards
+    # that hold for this call: where the food is, and which squares
+    # are too close to a ghost. The map is a NumericGrid, and the
+    # utilities are gathered from a view of it in one go.
+    def load(self, grid, food, ghosts):
+        if self.cells is None:
+            self.cells = numpy.array([grid.index(x, y) for (x, y) in self.transitions.squares], dtype=int)
+        self.utilities[:self.sentinel] = grid.view().reshape(-1)[self.cells]
+
+        field = RewardField(self.transitions, food, ghosts)
+        self.food[:] = numpy.frombuffer(field.food, dtype=numpy.int8) != 0
+        self.danger[:] = numpy.frombuffer(field.danger, dtype=numpy.int8) != 0
+        for group in self.groups:
+            danger = self.danger[group['cells']]
+            group['food'][:] = self.food[group['cells']] & ~danger
+            group['base'][:] = numpy.where(danger, -10.0, -0.1)
+
+    # Copy the utilities back into the map.
+    def save(self, grid):
+        grid.view().reshape(-1)[self.cells[self.open]] = self.utilities[self.open]
+
+    # Run num sweeps of value iteration over the map, the equivalent of
+    # MDPAgent.updateUtilities(walls, food, ghosts, num, state, epsilon,
+    # deadline). Stops early once a sweep changes no square by more than
+    # epsilon, or once time.time() passes deadline. The deadline is
+    # checked every BLOCK sweeps with epsilon; without it, after as many
+    # sweeps as the time left looks like it has room for.
+    #
+    # Returns the number of sweeps run, the residual (the largest
+    # change to a square) of the last one, and whether the deadline
+    # stopped it before num sweeps.
+    def updateUtilities(self, grid, food, ghosts, num, epsilon=None, deadline=None):
+        self.load(grid, food, ghosts)
+        if epsilon == None and deadline == None:
+            residuals = self.sweep(num)
+            self.save(grid)
+            return num, float(residuals[-1]) if num > 0 else 0.0, False
+
+        sweeps = 0
+        residual = 0.0
+        timedOut = False
+        begin = time.time()
+        perSweep = 0.0
+        while sweeps < num:
+            block = NumpyEngine.BLOCK
+            if epsilon == None and perSweep > 0:
+                # Double up for as long as there looks to be time, so
+                # there are only a few block sizes to keep schedules for.
+                # Until the sweeps so far have taken a tick of the clock
+                # there is nothing to go on, so the blocks stay short.
+                room = (deadline - time.time()) / perSweep
+                while block * 2 <= room:
+                    block *= 2
+            block = min(block, num - sweeps)
+            before = self.utilities.copy()
+            residuals = self.sweep(block)
+            if epsilon != None:
+                done = numpy.nonzero(residuals <= epsilon)[0]
+                if len(done) > 0 and done[0] < block - 1:
+                    # Converged part way through: run just that far
+                    self.utilities[:] = before
+                    block = done[0] + 1
+                    residuals = self.sweep(block)
+            sweeps += block
+            perSweep = (time.time() - begin) / sweeps
+            residual = residuals[-1]
+            if epsilon != None and residual <= epsilon:
+                break
+            if deadline != None and time.time() >= deadline:
+                timedOut = sweeps < num
+                break
+
+        self.save(grid)
+        return sweeps, float(residual), timedOut
+
+    # Run num pipelined sweeps over the utilities, and return the
+    # residual of each.
+    def sweep(self, num):
+        u = self.utilities
+        residuals = numpy.zeros(num)
+        for (cells, outcomes, p, food, base, starts, sweeps) in self.schedule(num):
+            # Expected utility of each move, then the best of them.
+            # The sums are done in the same order as the loop version
+            # so the results match to the last bit.
+            v = u[outcomes]
+            best = (p[0] * v[0] + p[1] * v[1] + p[2] * v[2]).max(axis=0)
+            # Food only pays if the square doesn't already hold the
+            # food reward, just as in the loop version.
+            old = u[cells]
+            reward = numpy.where(food & (old != 10), 10.0, base)
+            new = reward + self.discount * best
+            u[cells] = new
+
+            # The largest change on each diagonal goes to its sweep
+            changes = numpy.maximum.reduceat(numpy.abs(new - old), starts)
+            residuals[sweeps] = numpy.maximum(residuals[sweeps], changes)
+        return residuals
+
+#
+# Prioritized sweeping.
+#
+# Between two moves only a few squares change reward: the food Pacman
+# just ate, the squares around the ghosts, and the square Pacman is on
+# (which MDPAgent resets to 1). Rather than sweeping the whole map, this
+# engine keeps the utilities from last time, puts the squares that
+# changed on a priority queue, and backs up the square with the biggest
+# pending change first. Whenever a backup moves a square by more than
+# the threshold, the squares whose backup reads it are queued too, so
+# the update spreads outward only as far as it matters.
+#
+# The backup is the one MDPAgent.updateUtilities does, with one
+# difference: food always pays its reward. The loop version skips the
+# reward when the square holds exactly 10, which only happens on the
+# very first sweep over a fresh map.
+#
+class SweepingEngine:
+
+    # Constructor
+    #
+    # transitions: the transition table for the layout, from api.transitions()
+    # discount:    the discount factor (MDPAgent calls it gemma)
+    # threshold:   the smallest change that is passed on to neighbours
+    def __init__(self, transitions, discount=0.1, threshold=0.001):
+        self.discount = discount
+        self.threshold = threshold
+        self.transitions = transitions
+        self.squares = transitions.squares
+
+        # For each square, the moves it can make, as the indices of the
+        # squares the three outcomes land on with their probabilities.
+        self.moves = []
+        for k in range(transitions.size()):
+            moves = []
+            for a in range(4):
+                if transitions.neighbours[4*k + a] != -1:
+                    s = 12*k + 3*a
+                    moves.append(tuple(zip(transitions.successors[s:s + 3], transitions.probabilities[s:s + 3])))
+            self.moves.append(moves)
+
+        # predecessors[k] lists the squares whose backup reads square k.
+        self.predecessors = [set() for square in self.squares]
+        for k, moves in enumerate(self.moves):
+            for move in moves:
+                for (j, p) in move:
+                    self.predecessors[j].add(k)
+        self.predecessors = [list(p) for p in self.predecessors]
+
+        self.utilities = None
+        self.rewards = None
+
+    # The reward for every square given where the food and ghosts are.
+    def makeRewards(self, food, ghosts):
+        field = RewardField(self.transitions, food, ghosts)
+        rewards = []
+        for k in range(len(self.squares)):
+            if field.danger[k]:
+                rewards.append(-10)
+            elif field.food[k]:
+                rewards.append(10)
+            else:
+                rewards.append(-0.1)
+        return rewards
+
+    # The Bellman backup for square k.
+    def backup(self, k):
+        u = self.utilities
+        best = None
+        for ((first, p), (second, q), (third, r)) in self.moves[k]:
+            value = p * u[first] + q * u[second] + r * u[third]
+            if best == None or value > best:
+                best = value
+        return self.rewards[k] + self.discount * best
+
+    # Bring the map up to date, the equivalent of
+    # MDPAgent.updateUtilities(walls, food, ghosts, num, state, epsilon,
+    # deadline). epsilon, if given, replaces the threshold. num caps the
+    # work at num backups per square, as many as num full sweeps.
+    #
+    # Returns the work done, in full sweeps' worth of backups, the
+    # largest change still pending when we stopped, and whether the
+    # deadline stopped it with work left to do.
+    def updateUtilities(self, grid, food, ghosts, num, epsilon=None, deadline=None):
+        threshold = self.threshold
+        if epsilon != None:
+            threshold = epsilon
+        rewards = self.makeRewards(food, ghosts)
+
+        # Seed the queue with every square whose reward changed or whose
+        # utility was changed on the map since last time. The queue
+        # hands out the lowest priority first, so priorities are negated.
+        # Squares only go in with update, which keeps them in the queue's
+        # index, so later updates don't have to look for them.
+        queue = util.PriorityQueue()
+        if self.utilities == None:
+            self.utilities = [grid.getValue(x, y) for (x, y) in self.squares]
+            for k in range(len(self.squares)):
+                if len(self.moves[k]) > 0:
+                    queue.update(k, -float('inf'))
+        else:
+            for k, (x, y) in enumerate(self.squares):
+                value = grid.getValue(x, y)
+                change = abs(value - self.utilities[k]) + abs(rewards[k] - self.rewards[k])
+                if change > 0 and len(self.moves[k]) > 0:
+                    self.utilities[k] = value
+                    queue.update(k, -change)
+        self.rewards = rewards
+
+        touched = set()
+        backups = 0
+        settled = 0.0
+        timedOut = False
+        limit = num * len(self.squares)
+        while not queue.isEmpty() and backups < limit:
+            k = queue.pop()
+            old = self.utilities[k]
+            new = self.backup(k)
+            self.utilities[k] = new
+            touched.add(k)
+            backups += 1
+            change = abs(new - old)
+            if change > threshold:
+                for j in self.predecessors[k]:
+                    if len(self.moves[j]) > 0:
+                        queue.update(j, -change)
+            else:
+                settled = max(settled, change)
+            if deadline != None and time.time() >= deadline:
+                timedOut = not queue.isEmpty() and backups < limit
+                break
+
+        # Whatever is left on the queue has not been passed on yet.
+        residual = settled
+        if not queue.isEmpty():
+            residual = max(residual, -min([p for (p, c, k) in queue.entriesLeft()]))
+
+        for k in touched:
+            x, y = self.squares[k]
+            grid.setValue(x, y, self.utilities[k])
+        return backups / float(max(1, len(self.squares))), residual, timedOut
+
+#
+# Value iteration in the background.
+#
+# The agent's map is swept over and over on a thread of its own, using
+# the food and ghosts the agent last saw, while the game gets on with
+# the ghosts' turns and the display. When it is Pacman's turn again the
+# agent pauses the worker, which happens between two sweeps, hands it
+# what it sees now, and picks a move from the map as it stands.
+#
+# Only one thread runs python code at a time, so this pays off when the
+# game waits (for the display, say) rather than when it computes. Once
+# a sweep changes no square by more than epsilon the worker waits for
+# new food and ghosts instead of sweeping on. Without a discount the
+# residual may never get that low, so the worker also waits once it has
+# run limit sweeps on the same food and ghosts.
+#
+class BackgroundWorker:
+
+    # Constructor
+    #
+    # sweep:   a function of the food and the ghosts that runs one sweep
+    #          of value iteration on the agent's map and returns the
+    #          residual
+    # food:    the food the agent can see
+    # ghosts:  where the ghosts are
+    # epsilon: the residual below which there is nothing left to do
+    # limit:   the most sweeps to run between two updates, or None to
+    #          rely on epsilon alone
+    def __init__(self, sweep, food, ghosts, epsilon=1e-6, limit=None):
+        self.sweep = sweep
+        self.food = food
+        self.ghosts = ghosts
+        self.epsilon = epsilon
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.changed = threading.Event()
+        self.waiting = False
+        self.stopped = False
+        self.sweeps = 0
+        self.residual = 0.0
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped:
+            # Let the agent in if it is waiting for the map
+            if self.waiting:
+                time.sleep(0.0001)
+                continue
+            self.lock.acquire()
+            try:
+                if self.stopped:
+                    break
+                # The sweep uses the latest food and ghosts
+                self.changed.clear()
+                residual = self.sweep(self.food, self.ghosts)
+                self.sweeps += 1
+                self.residual = residual
+                done = residual <= self.epsilon or (self.limit != None and self.sweeps >= self.limit)
+            finally:
+                self.lock.release()
+            # Nothing more to do until there are new food and ghosts
+            if done:
+                while not self.changed.isSet():
+                    self.changed.wait(0.1)
+
+    # Stop sweeping once the sweep under way is done, so that the agent
+    # can use the map. Every pause must be followed by a resume.
+    def pause(self):
+        self.waiting = True
+        self.lock.acquire()
+        self.waiting = False
+
+    def resume(self):
+        self.lock.release()
+
+    # Sweep with new food and ghosts from now on. Only call this while
+    # paused. Returns how many sweeps have been run since the last
+    # update, and the residual of the last one.
+    def update(self, food, ghosts):
+        self.food = food
+        self.ghosts = ghosts
+        self.changed.set()
+        sweeps = self.sweeps
+        self.sweeps = 0
+        return sweeps, self.residual
+
+    # Stop the thread for good.
+    def stop(self):
+        self.stopped = True
+        self.changed.set()
+        self.thread.join()